@@ -0,0 +1,3 @@
+"""
+Benchmarks of the metric kernels and data readers, run on synthetic data.
+"""
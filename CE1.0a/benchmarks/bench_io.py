@@ -0,0 +1,186 @@
+'''
+Benchmark of the data readers.
+Times the reading of each reader (graph, mesh, particles, ce), population type and number of dimensions
+on fixtures written by fixtures.py in a temporary directory. The scaling grid varies
+    N   elements: graph nodes, particles or CE elements
+    L   cells in each axis of the mesh and CE spatial grids
+    P   realizations
+    T   time steps
+    G   groups
+Particles are read through the stand-in Silo module in standin/.
+Results are written as JSON, to be compared between checkouts with compare.py.
+
+Usage, from any directory:
+    python benchmarks/bench_io.py -o results.json [--quick] [--repeat 3] [--max-seconds 10] [--reader mesh ...] [--keep <directory>]
+'''
+
+import sys, getopt
+import os, os.path
+import shutil
+import tempfile
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(directory, 'standin'))
+sys.path.append(os.path.join(directory, '..', 'tools'))
+sys.path.append(directory)
+from collections import OrderedDict
+import fixtures as fx
+import timing as tm
+
+#Reader -> (module, function reading a variable)
+READERS = OrderedDict([
+    ('graph', ('graph_tools', 'readGraphData')),
+    ('mesh', ('mesh_tools', 'readMeshData')),
+    ('particles', ('meshless_tools', 'readMeshlessData')),
+    ('ce', ('ce_data_tools', 'readCEData')),
+])
+
+#Reader -> (base case, scaled parameters in increasing cost)
+GRIDS = {
+    'graph': ({'N': 1000, 'P': 4, 'T': 3, 'G': 2}, {'N': [100, 1000, 10000, 100000], 'P': [2, 4, 16, 64], 'T': [3, 10]}),
+    'mesh': ({'L': 16, 'P': 4, 'T': 3, 'G': 2}, {'L': [8, 16, 32, 64], 'P': [2, 4, 16, 64], 'T': [3, 10]}),
+    'particles': ({'N': 1000, 'P': 4, 'T': 3, 'G': 2}, {'N': [100, 1000, 10000, 100000], 'P': [2, 4, 16, 64], 'T': [3, 10]}),
+    'ce': ({'N': 1000, 'L': 32, 'P': 4, 'T': 3, 'G': 2}, {'N': [1000, 10000, 100000, 1000000], 'L': [32, 128, 512], 'P': [2, 4, 16, 64], 'T': [3, 10]}),
+}
+
+class Fixtures(object):
+    '''
+    Writes the fixture of each case once, under a common directory.
+    '''
+
+    def __init__(self, root):
+        self.root = root
+        self.written = {}
+
+    def section(self, reader, popType, dims, params):
+        '''
+        Gets the parameter section of a case, writing its files the first time.
+
+        Input:
+            reader      reader name
+            popType     "statistical" or "spatial"
+            dims        dimensions of the variable
+            params      case parameters
+        Returns:
+                        dictionary option -> value
+        '''
+        key = (reader, popType, dims, tuple(sorted(params.items())))
+        if key not in self.written:
+            folder = os.path.join(self.root, str(len(self.written)))
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            counts = {'[P]': params['P'], '[T]': params['T'], '[G]': params['G']}
+            if reader == 'mesh' or (reader == 'ce' and popType == 'spatial'):
+                size = params['L']
+            else:
+                size = params['N']
+            self.written[key] = fx.WRITERS[reader](folder, 'var', popType, dims, counts, size)
+        return self.written[key]
+
+def readerSetup(fixtures, reader, popType, dims):
+    '''
+    Builds the setup of a reader case.
+
+    Input:
+        fixtures    Fixtures
+        reader      reader name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+    Returns:
+                    setup function
+    '''
+    def setup(params):
+        parameters = fx.configuration({'var': fixtures.section(reader, popType, dims, params)})
+        #Imported here, so a reader that fails to import is recorded as an error of its cases
+        moduleName, functionName = READERS[reader]
+        read = getattr(__import__(moduleName), functionName)
+        def run():
+            #The readers print their errors and return None
+            if read(parameters, 'var') is None:
+                raise Exception('the reader failed, see its ERROR output')
+        return run
+    return setup
+
+def buildCases(fixtures, readers, quick=False):
+    '''
+    Builds the cases of the selected readers, for every population type and dimension.
+
+    Input:
+        fixtures    Fixtures
+        readers     reader names
+        quick       true to keep only the two cheapest values of each scaled parameter
+    Returns:
+                    list of Case
+    '''
+    cases = []
+    for reader in readers:
+        base, axes = GRIDS[reader]
+        if quick:
+            axes = dict((axis, values[:2]) for axis, values in axes.items())
+        for popType in ['statistical', 'spatial']:
+            for dims in [2, 3, 4]:
+                name = reader + '_' + popType + '_' + str(dims)
+                setup = readerSetup(fixtures, reader, popType, dims)
+                for series, params in tm.grid(base, axes):
+                    #Parameters without effect on this variable would only repeat the base case
+                    if series == 'P' and popType == 'spatial' or series == 'T' and dims < 3:
+                        continue
+                    cases.append(tm.Case(name, series, params, setup))
+    return cases
+
+def main(argv):
+    '''
+    Main function. Writes the fixtures, runs the benchmarks and writes the results.
+
+    Input:
+        argv    standard arguments
+    '''
+    usage = 'USAGE: python bench_io.py -o <results.json> [--quick] [--repeat <n>] [--max-seconds <s>] [--reader <name>]... [--keep <directory>]'
+    try:
+        opts, args = getopt.getopt(argv, "ho:", ["help", "output=", "quick", "repeat=", "max-seconds=", "reader=", "keep="])
+    except getopt.GetoptError:
+        print usage
+        raise Exception()
+    output = 'bench_io.json'
+    quick = False
+    repeat = 3
+    maxSeconds = 10.0
+    readers = []
+    keep = None
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print usage
+            sys.exit()
+        elif opt in ('-o', '--output'):
+            output = arg
+        elif opt == '--quick':
+            quick = True
+        elif opt == '--repeat':
+            repeat = int(arg)
+        elif opt == '--max-seconds':
+            maxSeconds = float(arg)
+        elif opt == '--reader':
+            readers.append(arg)
+        elif opt == '--keep':
+            keep = arg
+    for reader in readers:
+        if reader not in READERS:
+            print 'ERROR: Reader ', reader, ' does not exist. Available: ', ', '.join(READERS.keys())
+            raise Exception()
+    if len(readers) == 0:
+        readers = READERS.keys()
+
+    if keep is not None:
+        root = os.path.abspath(keep)
+        if not os.path.isdir(root):
+            os.makedirs(root)
+    else:
+        root = tempfile.mkdtemp(prefix='ce_bench_io_')
+    try:
+        results = tm.runCases(buildCases(Fixtures(root), readers, quick), repeat, maxSeconds)
+    finally:
+        if keep is None:
+            shutil.rmtree(root, ignore_errors=True)
+    tm.writeResults(output, results)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
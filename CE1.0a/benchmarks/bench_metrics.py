@@ -0,0 +1,167 @@
+'''
+Benchmark of the metric kernels.
+Each metric is timed on synthetic populations over a scaling grid of
+    N   elements
+    P   population
+    B   bins
+    T   time steps
+and, where the metric has them, V variables and G groups. The grid varies one parameter at a time
+around a base case. Results are written as JSON, to be compared between checkouts with compare.py.
+
+Usage, from any directory:
+    python benchmarks/bench_metrics.py -o results.json [--quick] [--repeat 3] [--max-seconds 10] [--metric pdf_single ...]
+'''
+
+import sys, getopt
+import os, os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from collections import OrderedDict
+import synthetic as syn
+import timing as tm
+
+#Each setup imports its metric, so a metric that fails to import is recorded as an error of its cases
+def pdfSingle(params):
+    data = syn.population(params['N'], params['P'], params['B'], params['continuous'], params['ragged'])
+    bins = syn.binValues(params['B'], params['continuous'])
+    import PDF
+    return lambda: PDF.single(data, bins, params['continuous'])
+
+def pdfJoint(params):
+    dataA = syn.population(params['N'], params['P'], params['B'], params['continuous'])
+    dataB = syn.population(params['N'], params['P'], params['B'], params['continuous'])
+    bins = syn.binValues(params['B'], params['continuous'])
+    import PDF
+    return lambda: PDF.joint(dataA, bins, params['continuous'], dataB, bins, params['continuous'])
+
+def mutualInformation(params):
+    import PDF
+    import MI
+    dataA = syn.population(params['N'], params['P'], params['B'])
+    dataB = syn.population(params['N'], params['P'], params['B'])
+    bins = syn.binValues(params['B'])
+    pdfA = PDF.single(dataA, bins, False)
+    pdfB = PDF.single(dataB, bins, False)
+    joint = PDF.joint(dataA, bins, False, dataB, bins, False)
+    return lambda: MI.calculate(pdfA, pdfB, joint)
+
+def idtSystem(params):
+    initial, times = syn.timeSeries(params['T'], params['N'], params['P'], params['B'])
+    bins = syn.binValues(params['B'])
+    import IDT
+    return lambda: IDT.system(initial, times, 0.1, 1, bins, False)
+
+def idtIndividual(params):
+    initial, times = syn.timeSeries(params['T'], params['N'], params['P'], params['B'])
+    bins = syn.binValues(params['B'])
+    import IDT
+    return lambda: IDT.individual(initial, times, 1, bins, False, 1.0, 1.0, 1.0)
+
+def multiInformation(params):
+    data = syn.variables(params['V'], params['N'], params['P'], params['B'])
+    bins = syn.binValues(params['B'])
+    import MultiInfo
+    return lambda: MultiInfo.calculate(data, bins, False, 1.0, 1.0, 1.0)
+
+def informationIntegration(params):
+    initial, group = syn.groups(params['G'], params['T'], params['N'], params['P'], params['B'])
+    bins = syn.binValues(params['B'])
+    import Information_integration as II
+    return lambda: II.calculate(initial, group, 1, bins, False, 1.0, 1.0, 1.0, 1.0)
+
+def deftPdf(params):
+    data = syn.population(params['N'], params['P'], params['B'], True)
+    import deft
+    return lambda: deft.deft(data, params['g'], 0, params['B'])
+
+#Benchmark name -> (setup, base case, scaled parameters in increasing cost)
+BENCHMARKS = OrderedDict([
+    ('pdf_single', (pdfSingle, {'N': 1000, 'P': 100, 'B': 8, 'continuous': False, 'ragged': 0.0},
+        {'N': [100, 1000, 10000, 100000], 'P': [10, 100, 1000, 10000], 'B': [2, 8, 32, 128]})),
+    ('pdf_single_continuous', (pdfSingle, {'N': 1000, 'P': 100, 'B': 8, 'continuous': True, 'ragged': 0.0},
+        {'N': [100, 1000, 10000, 100000], 'P': [10, 100, 1000, 10000], 'B': [2, 8, 32, 128]})),
+    ('pdf_single_ragged', (pdfSingle, {'N': 1000, 'P': 100, 'B': 8, 'continuous': False, 'ragged': 0.5},
+        {'N': [100, 1000, 10000, 100000], 'P': [10, 100, 1000, 10000], 'ragged': [0.1, 0.5, 0.9]})),
+    ('pdf_joint', (pdfJoint, {'N': 1000, 'P': 100, 'B': 8, 'continuous': False},
+        {'N': [100, 1000, 10000, 100000], 'P': [10, 100, 1000, 10000], 'B': [2, 8, 32, 64]})),
+    ('mutual_information', (mutualInformation, {'N': 1000, 'P': 100, 'B': 8},
+        {'N': [100, 1000, 10000, 100000], 'B': [2, 8, 32, 64]})),
+    ('idt_system', (idtSystem, {'T': 10, 'N': 1000, 'P': 100, 'B': 8},
+        {'T': [5, 10, 50, 200], 'N': [100, 1000, 10000], 'P': [10, 100, 1000], 'B': [2, 8, 32]})),
+    ('idt_individual', (idtIndividual, {'T': 5, 'N': 20, 'P': 50, 'B': 4},
+        {'T': [2, 5, 10, 20], 'N': [10, 20, 50, 100], 'P': [10, 50, 200], 'B': [2, 4, 8, 16]})),
+    ('multi_information', (multiInformation, {'V': 3, 'N': 20, 'P': 50, 'B': 4},
+        {'V': [2, 3, 4, 5], 'N': [10, 20, 50, 100], 'P': [10, 50, 200], 'B': [2, 4, 8]})),
+    ('information_integration', (informationIntegration, {'G': 4, 'T': 5, 'N': 10, 'P': 20, 'B': 4},
+        {'G': [2, 4, 8], 'T': [2, 5, 10], 'N': [5, 10, 20, 50], 'P': [10, 20, 50], 'B': [2, 4, 8]})),
+    ('deft', (deftPdf, {'N': 5, 'P': 200, 'B': 10, 'g': 50},
+        {'N': [2, 5, 20], 'P': [50, 200, 1000], 'g': [20, 50, 100]})),
+])
+
+def buildCases(names, quick=False):
+    '''
+    Builds the cases of the selected benchmarks.
+
+    Input:
+        names   benchmark names
+        quick   true to keep only the two cheapest values of each scaled parameter
+    Returns:
+                list of Case
+    '''
+    cases = []
+    for name in names:
+        setup, base, axes = BENCHMARKS[name]
+        if quick:
+            axes = dict((axis, values[:2]) for axis, values in axes.items())
+        for series, params in tm.grid(base, axes):
+            cases.append(tm.Case(name, series, params, setup))
+    return cases
+
+def main(argv):
+    '''
+    Main function. Runs the benchmarks and writes the results.
+
+    Input:
+        argv    standard arguments
+    '''
+    usage = 'USAGE: python bench_metrics.py -o <results.json> [--quick] [--repeat <n>] [--max-seconds <s>] [--metric <name>]...'
+    try:
+        opts, args = getopt.getopt(argv, "ho:", ["help", "output=", "quick", "repeat=", "max-seconds=", "metric=", "list"])
+    except getopt.GetoptError:
+        print usage
+        raise Exception()
+    output = 'bench_metrics.json'
+    quick = False
+    repeat = 3
+    maxSeconds = 10.0
+    names = []
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print usage
+            sys.exit()
+        elif opt in ('-o', '--output'):
+            output = arg
+        elif opt == '--quick':
+            quick = True
+        elif opt == '--repeat':
+            repeat = int(arg)
+        elif opt == '--max-seconds':
+            maxSeconds = float(arg)
+        elif opt == '--metric':
+            names.append(arg)
+        elif opt == '--list':
+            print '\n'.join(BENCHMARKS.keys())
+            sys.exit()
+    for name in names:
+        if name not in BENCHMARKS:
+            print 'ERROR: Benchmark ', name, ' does not exist. Available: ', ', '.join(BENCHMARKS.keys())
+            raise Exception()
+    if len(names) == 0:
+        names = BENCHMARKS.keys()
+
+    results = tm.runCases(buildCases(names, quick), repeat, maxSeconds)
+    tm.writeResults(output, results)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+'''
+Compares two benchmark results files, as written by bench_metrics.py or bench_io.py.
+Cases are matched by benchmark and parameters, and their fastest repetitions compared.
+
+Usage:
+    python benchmarks/compare.py <base.json> <new.json> [--threshold 1.1]
+Exits with status 1 when a case is slower than threshold times its base time, or fails where it ran before.
+'''
+
+import sys, getopt
+import os, os.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import timing as tm
+
+def caseKey(result):
+    '''
+    Key identifying a case in both files.
+
+    Input:
+        result  result dictionary
+    Returns:
+                hashable key
+    '''
+    return (result['benchmark'], tuple(sorted(result['params'].items())))
+
+def status(result):
+    '''
+    Text of a result: time, error or skipped.
+
+    Input:
+        result  result dictionary, None if missing
+    Returns:
+                text
+    '''
+    if result is None:
+        return 'missing'
+    if result['skipped']:
+        return 'skipped'
+    if result['error'] is not None:
+        return 'error'
+    return '%.6f' % result['min']
+
+def compare(base, new, threshold=1.1):
+    '''
+    Prints the comparison of two results files.
+
+    Input:
+        base        results dictionary of the reference checkout
+        new         results dictionary of the checkout being measured
+        threshold   ratio new/base over which a case is a regression
+    Returns:
+                    number of regressions
+    '''
+    baseResults = dict((caseKey(r), r) for r in base['results'])
+    newResults = dict((caseKey(r), r) for r in new['results'])
+    #Cases of the new file first, then the ones only in the base file
+    keys = [caseKey(r) for r in new['results']] + [caseKey(r) for r in base['results'] if caseKey(r) not in newResults]
+    regressions = 0
+    print 'base:', base['environment'].get('commit'), ' new:', new['environment'].get('commit')
+    print '%-24s %-48s %12s %12s %8s' % ('benchmark', 'params', 'base', 'new', 'ratio')
+    for key in keys:
+        b = baseResults.get(key)
+        n = newResults.get(key)
+        ratio = ''
+        flag = ''
+        if b is not None and n is not None and b['min'] is not None and n['min'] is not None:
+            ratio = '%.2f' % (n['min'] / b['min']) if b['min'] > 0 else 'inf'
+            if b['min'] > 0 and n['min'] / b['min'] > threshold:
+                flag = ' SLOWER'
+                regressions = regressions + 1
+        elif b is not None and b['min'] is not None and n is not None and n['error'] is not None:
+            flag = ' FAILS'
+            regressions = regressions + 1
+        params = ' '.join(str(k) + '=' + str(v) for k, v in key[1])
+        print '%-24s %-48s %12s %12s %8s%s' % (key[0], params, status(b), status(n), ratio, flag)
+    return regressions
+
+def main(argv):
+    '''
+    Main function.
+
+    Input:
+        argv    standard arguments
+    '''
+    usage = 'USAGE: python compare.py <base.json> <new.json> [--threshold <ratio>]'
+    try:
+        opts, args = getopt.gnu_getopt(argv, "h", ["help", "threshold="])
+    except getopt.GetoptError:
+        print usage
+        raise Exception()
+    threshold = 1.1
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print usage
+            sys.exit()
+        elif opt == '--threshold':
+            threshold = float(arg)
+    if len(args) != 2:
+        print usage
+        raise Exception()
+    regressions = compare(tm.readResults(args[0]), tm.readResults(args[1]), threshold)
+    if regressions > 0:
+        print regressions, 'regressions'
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
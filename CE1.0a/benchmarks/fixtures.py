@@ -0,0 +1,411 @@
+'''
+Synthetic input data for the readers.
+Writes directory trees in the layout each reader expects, one file or folder per realization [P],
+time step [T] and group [G], and the parameter section to read them:
+    graph       Boost DOT graphs with nodes n<i>, node fields "state" and "value", edge field "weight"
+    mesh        SAMRAI output, summary.samrai and processor_cluster.NNNNN.samrai patch files
+    particles   Silo-like particle files, read through the stand-in Silo module in standin/
+    ce          CE HDF5 files with one dataset per field
+
+Usage, to write every format with a parameter file for workflow.py:
+    python benchmarks/fixtures.py -o <directory> [--elements 1000] [--side 16] [--realizations 4] [--steps 3] [--groups 2]
+'''
+
+import sys, getopt
+import os, os.path
+import itertools
+import ConfigParser
+import h5py
+import numpy as np
+
+#Wildcard -> parameter prefix
+WILDCARDS = [('[G]', 'group'), ('[T]', 'time'), ('[P]', 'stat')]
+
+def wildcards(popType, dims):
+    '''
+    Gets the wildcards of a variable.
+
+    Input:
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable, 2 to 4
+    Returns:
+                    list of wildcards
+    '''
+    names = []
+    if dims == 4:
+        names.append('[G]')
+    if dims >= 3:
+        names.append('[T]')
+    if popType == 'statistical':
+        names.append('[P]')
+    return names
+
+def expand(pattern, counts):
+    '''
+    Lists the files of a pattern.
+
+    Input:
+        pattern     file name with wildcards
+        counts      dictionary wildcard -> number of values, from 0
+    Returns:
+                    list of file names
+    '''
+    present = [w for w, prefix in WILDCARDS if pattern.count(w)]
+    names = []
+    for values in itertools.product(*[xrange(counts[w]) for w in present]):
+        name = pattern
+        for w, value in zip(present, values):
+            name = name.replace(w, str(value))
+        names.append(name)
+    return names
+
+def sectionOptions(reader, pattern, field, popType, dims, counts):
+    '''
+    Builds the parameter section of a variable.
+
+    Input:
+        reader      reader name
+        pattern     file name with wildcards
+        field       field name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        counts      dictionary wildcard -> number of values
+    Returns:
+                    dictionary option -> value
+    '''
+    options = {'reader': reader, 'input_files': pattern, 'field': field, 'population_type': popType, 'dimensions': str(dims)}
+    for w, prefix in WILDCARDS:
+        if pattern.count(w):
+            options[prefix + '_from'] = '0'
+            options[prefix + '_to'] = str(counts[w] - 1)
+    return options
+
+def filePattern(root, name, popType, dims, extension=''):
+    '''
+    Builds the file name pattern of a variable.
+
+    Input:
+        root        fixture directory
+        name        variable name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        extension   file extension, empty for folders
+    Returns:
+                    file name with wildcards
+    '''
+    suffix = ''.join('_' + w for w in wildcards(popType, dims))
+    return os.path.join(root, name + suffix + extension)
+
+def ringEdges(nodes, degree, rewire=0.0):
+    '''
+    Generates a ring lattice, each node linked to the following degree/2 nodes,
+    with a fraction of the edges moved to random targets.
+
+    Input:
+        nodes       number of nodes
+        degree      mean degree
+        rewire      fraction of edges rewired
+    Returns:
+                    arrays of edge sources and targets
+    '''
+    half = max(1, degree // 2)
+    sources = np.repeat(np.arange(nodes), half)
+    targets = (sources + np.tile(np.arange(1, half + 1), nodes)) % nodes
+    moved = np.random.uniform(size=len(targets)) < rewire
+    targets[moved] = np.random.randint(0, nodes, moved.sum())
+    #No self loops
+    loops = sources == targets
+    targets[loops] = (targets[loops] + 1) % nodes
+    return sources, targets
+
+def dotNumber(value):
+    '''
+    Formats a number as a DOT attribute value. Numbers in exponent notation are not DOT numerals, so they are quoted.
+
+    Input:
+        value   number
+    Returns:
+                string
+    '''
+    text = '%.6g' % value
+    if 'e' in text:
+        return '"' + text + '"'
+    return text
+
+def writeDot(fileName, sources, targets, nodeFields, edgeFields):
+    '''
+    Writes a graph as Boost's write_graphviz does.
+
+    Input:
+        fileName    file name
+        sources     edge sources
+        targets     edge targets
+        nodeFields  dictionary field -> value of each node
+        edgeFields  dictionary field -> value of each edge
+    '''
+    nodes = len(nodeFields.values()[0])
+    with open(fileName, 'w') as f:
+        f.write('digraph G {\n')
+        for n in xrange(nodes):
+            f.write('n%d [%s];\n' % (n, ', '.join('%s=%s' % (name, dotNumber(nodeFields[name][n])) for name in sorted(nodeFields))))
+        for e in xrange(len(sources)):
+            f.write('n%d->n%d  [%s];\n' % (sources[e], targets[e], ', '.join('%s=%s' % (name, dotNumber(edgeFields[name][e])) for name in sorted(edgeFields))))
+        f.write('}\n')
+
+def writeGraph(root, name, popType, dims, counts, nodes, degree=4):
+    '''
+    Writes the DOT files of a graph variable. All the files share the topology.
+
+    Input:
+        root        fixture directory
+        name        variable name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        counts      dictionary wildcard -> number of values
+        nodes       number of nodes
+        degree      mean degree
+    Returns:
+                    parameter section options
+    '''
+    pattern = filePattern(root, name, popType, dims, '.dot')
+    sources, targets = ringEdges(nodes, degree, 0.1)
+    for fileName in expand(pattern, counts):
+        writeDot(fileName, sources, targets,
+                 {'state': np.random.randint(0, 2, nodes), 'value': np.random.uniform(size=nodes)},
+                 {'weight': np.random.uniform(size=len(sources))})
+    options = sectionOptions('graph', pattern, 'value', popType, dims, counts)
+    options['field_type'] = 'node'
+    return options
+
+def patchBoxes(shape, patches):
+    '''
+    Splits a mesh in patches.
+
+    Input:
+        shape       cells of the mesh in each axis
+        patches     patches in each axis
+    Returns:
+                    list of (lower, upper) inclusive cell corners
+    '''
+    cuts = [np.linspace(0, s, p + 1).astype(int) for s, p in zip(shape, patches)]
+    boxes = []
+    for index in itertools.product(*[xrange(p) for p in patches]):
+        lower = [cuts[a][index[a]] for a in xrange(3)]
+        upper = [cuts[a][index[a] + 1] - 1 for a in xrange(3)]
+        boxes.append((lower, upper))
+    return boxes
+
+def writeSamrai(folder, field, data, patches=(2, 2, 2), processors=4):
+    '''
+    Writes a 3D field as SAMRAI does, patches distributed over processor files.
+
+    Input:
+        folder      output folder
+        field       field name
+        data        field values XxYxZ
+        patches     patches in each axis
+        processors  number of processor files
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    boxes = patchBoxes(data.shape, patches)
+    processors = min(processors, len(boxes))
+    extentsType = np.dtype([('lower', '<i4', (3,)), ('upper', '<i4', (3,)), ('xlo', '<f8', (3,)), ('xup', '<f8', (3,))])
+    mapType = np.dtype([('processor_number', '<i4'), ('file_cluster_number', '<i4'), ('level_number', '<i4'), ('patch_number', '<i4')])
+    extents = np.zeros(len(boxes), dtype=extentsType)
+    patchMap = np.zeros(len(boxes), dtype=mapType)
+    files = [h5py.File(os.path.join(folder, 'processor_cluster.' + str(p).zfill(5) + '.samrai'), 'w') for p in xrange(processors)]
+    for iPatch, (lower, upper) in enumerate(boxes):
+        iProc = iPatch % processors
+        extents[iPatch] = (lower, upper, lower, [u + 1 for u in upper])
+        patchMap[iPatch] = (iProc, iProc, 0, iPatch)
+        values = data[lower[0]:upper[0] + 1, lower[1]:upper[1] + 1, lower[2]:upper[2] + 1]
+        path = '/processor.' + str(iProc).zfill(5) + '/level.00000/patch.' + str(iPatch).zfill(5) + '/' + field
+        files[iProc].create_dataset(path, data=values.ravel(order='F'))
+    for f in files:
+        f.close()
+    with h5py.File(os.path.join(folder, 'summary.samrai'), 'w') as f:
+        f.create_dataset('/BASIC_INFO/number_processors', data=np.array([processors], dtype='<i4'))
+        f.create_dataset('/BASIC_INFO/number_patches_at_level', data=np.array([len(boxes)], dtype='<i4'))
+        f.create_dataset('/BASIC_INFO/var_names', data=np.array([field]))
+        f.create_dataset('/extents/patch_extents', data=extents)
+        f.create_dataset('/extents/patch_map', data=patchMap)
+
+def writeMesh(root, name, popType, dims, counts, side, patches=(2, 2, 2), processors=4):
+    '''
+    Writes the SAMRAI folders of a mesh variable.
+
+    Input:
+        root        fixture directory
+        name        variable name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        counts      dictionary wildcard -> number of values
+        side        cells in each axis
+        patches     patches in each axis
+        processors  number of processor files
+    Returns:
+                    parameter section options
+    '''
+    pattern = filePattern(root, name, popType, dims)
+    for folder in expand(pattern, counts):
+        writeSamrai(folder, 'value', np.random.uniform(size=(side, side, side)), patches, processors)
+    options = sectionOptions('mesh', pattern, 'value', popType, dims, counts)
+    options['periodical'] = 'true'
+    options['stencil'] = '1'
+    return options
+
+def writeSilo(folder, field, coords, values, files=4):
+    '''
+    Writes particles in the layout of SAMRAI's Silo output, split in slabs along x.
+
+    Input:
+        folder      output folder
+        field       field name
+        coords      particle coordinates DxN
+        values      field value of each particle
+        files       number of processor files
+    '''
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    order = np.argsort(coords[0], kind='mergesort')
+    for p, part in enumerate(np.array_split(order, files)):
+        number = str(p).zfill(5)
+        with h5py.File(os.path.join(folder, 'processor_cluster.' + number + '.silo'), 'w') as f:
+            group = f.create_group('level_00000/patch_' + number)
+            group.create_dataset(field + '__data', data=values[part])
+            for axis in xrange(len(coords)):
+                group.create_dataset(field + 'PointMesh_coord' + str(axis), data=coords[axis][part])
+            group.create_dataset(field + 'PointMesh_min_extents', data=coords[:, part].min(axis=1))
+            group.create_dataset(field + 'PointMesh_max_extents', data=coords[:, part].max(axis=1))
+
+def writeParticles(root, name, popType, dims, counts, particles, ndims=2, length=10.0, neighbours=10, files=4):
+    '''
+    Writes the Silo-like folders of a particle variable.
+
+    Input:
+        root        fixture directory
+        name        variable name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        counts      dictionary wildcard -> number of values
+        particles   number of particles
+        ndims       spatial dimensions, 2 or 3
+        length      side of the domain
+        neighbours  mean number of particles within the radius
+        files       number of processor files
+    Returns:
+                    parameter section options
+    '''
+    pattern = filePattern(root, name, popType, dims)
+    for folder in expand(pattern, counts):
+        coords = np.random.uniform(0, length, (ndims, particles))
+        writeSilo(folder, 'value', coords, np.random.uniform(size=particles), files)
+    options = sectionOptions('particles', pattern, 'value', popType, dims, counts)
+    #Radius of the ball holding the requested neighbours on average
+    if ndims == 2:
+        radius = length * np.sqrt(neighbours / (np.pi * particles))
+    else:
+        radius = length * (3.0 * neighbours / (4 * np.pi * particles)) ** (1.0 / 3)
+    options['periodical'] = 'true'
+    options['radius'] = '%.6g' % radius
+    return options
+
+def writeCE(root, name, popType, dims, counts, size):
+    '''
+    Writes the HDF5 files of a CE variable. Statistical files hold N elements, spatial files a
+    two dimensional grid of side x side cells.
+
+    Input:
+        root        fixture directory
+        name        variable name
+        popType     "statistical" or "spatial"
+        dims        dimensions of the variable
+        counts      dictionary wildcard -> number of values
+        size        elements, or cells in each axis for spatial variables
+    Returns:
+                    parameter section options
+    '''
+    pattern = filePattern(root, name, popType, dims, '.h5')
+    shape = (size,) if popType == 'statistical' else (size, size)
+    for fileName in expand(pattern, counts):
+        with h5py.File(fileName, 'w') as f:
+            f.create_dataset('value', data=np.random.uniform(size=shape))
+    options = sectionOptions('hdf5', pattern, 'value', popType, dims, counts)
+    if popType == 'spatial':
+        options['stencil'] = '3'
+    return options
+
+#Reader -> fixture writer
+WRITERS = {'graph': writeGraph, 'mesh': writeMesh, 'particles': writeParticles, 'ce': writeCE}
+
+def configuration(sections):
+    '''
+    Builds the parameters of a set of variables.
+
+    Input:
+        sections    dictionary variable -> parameter section options
+    Returns:
+                    configParser parameters
+    '''
+    parameters = ConfigParser.RawConfigParser()
+    parameters.optionxform = str
+    for section in sorted(sections):
+        parameters.add_section(section)
+        for option in sorted(sections[section]):
+            parameters.set(section, option, sections[section][option])
+    return parameters
+
+def main(argv):
+    '''
+    Main function. Writes every reader, population type and dimension, and a parameter file reading them.
+
+    Input:
+        argv    standard arguments
+    '''
+    usage = 'USAGE: python fixtures.py -o <directory> [--elements <n>] [--side <n>] [--realizations <n>] [--steps <n>] [--groups <n>]'
+    try:
+        opts, args = getopt.getopt(argv, "ho:", ["help", "output=", "elements=", "side=", "realizations=", "steps=", "groups="])
+    except getopt.GetoptError:
+        print usage
+        raise Exception()
+    root = None
+    elements = 1000
+    side = 16
+    counts = {'[P]': 4, '[T]': 3, '[G]': 2}
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print usage
+            sys.exit()
+        elif opt in ('-o', '--output'):
+            root = arg
+        elif opt == '--elements':
+            elements = int(arg)
+        elif opt == '--side':
+            side = int(arg)
+        elif opt == '--realizations':
+            counts['[P]'] = int(arg)
+        elif opt == '--steps':
+            counts['[T]'] = int(arg)
+        elif opt == '--groups':
+            counts['[G]'] = int(arg)
+    if root is None:
+        print usage
+        raise Exception()
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        os.makedirs(root)
+
+    np.random.seed(0)
+    sections = {}
+    for reader in sorted(WRITERS):
+        for popType in ['statistical', 'spatial']:
+            for dims in [2, 3, 4]:
+                name = reader + '_' + popType + '_' + str(dims)
+                size = side if reader == 'mesh' or (reader == 'ce' and popType == 'spatial') else elements
+                sections[name] = WRITERS[reader](root, name, popType, dims, counts, size)
+    with open(os.path.join(root, 'fixtures.params'), 'w') as f:
+        configuration(sections).write(f)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
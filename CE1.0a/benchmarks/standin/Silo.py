@@ -0,0 +1,37 @@
+'''
+Stand-in for the VisIt Silo module, enough for the meshless reader to run without the Silo library.
+It reads the HDF5 files written by fixtures.writeSilo, which keep the directory and variable names
+of SAMRAI's particle output.
+'''
+
+import h5py
+
+class SiloFile(object):
+    '''
+    Silo database open for reading.
+    '''
+
+    def __init__(self, fileName):
+        self.hdf = h5py.File(fileName, mode='r')
+        self.directory = '/'
+
+    def SetDir(self, directory):
+        self.directory = '/' + directory.strip('/')
+
+    def GetVar(self, name):
+        #Silo returns the arrays as tuples
+        return tuple(self.hdf[self.directory + '/' + name][()].tolist())
+
+    def Close(self):
+        self.hdf.close()
+
+def Open(fileName):
+    '''
+    Opens a database.
+
+    Input:
+        fileName    file name
+    Returns:
+                    SiloFile
+    '''
+    return SiloFile(fileName)
@@ -0,0 +1,151 @@
+'''
+Synthetic populations for the benchmarks.
+Values are drawn from B bins, discrete (bin values 0..B-1) or continuous (bin edges 0..B).
+Time series start from an initial state and lose memory of it at a controllable mixing rate,
+so the temporal metrics find a decay to measure.
+'''
+
+import numpy as np
+import ragged as rg
+
+def binValues(bins, continuous=False):
+    '''
+    Gets the bin values for B bins.
+
+    Input:
+        bins        number of bins B
+        continuous  true for continuous bins, given by their B+1 edges
+    Returns:
+                    list of bin values
+    '''
+    if continuous:
+        return range(bins + 1)
+    return range(bins)
+
+def draw(shape, bins, continuous=False):
+    '''
+    Draws uniformly distributed values.
+
+    Input:
+        shape       shape of the values
+        bins        number of bins B
+        continuous  true for real values in [0, B), otherwise integers in 0..B-1
+    Returns:
+                    array of values
+    '''
+    if continuous:
+        return np.random.uniform(0, bins, shape)
+    return np.random.randint(0, bins, shape).astype('float')
+
+def raggedSizes(elements, population, ragged):
+    '''
+    Gets the population size of each element.
+
+    Input:
+        elements    number of elements N
+        population  maximum population P
+        ragged      fraction in [0, 1) the population may shrink, 0 for equal sizes
+    Returns:
+                    array of N sizes between P*(1-ragged) and P
+    '''
+    low = max(1, int(population * (1 - ragged)))
+    return np.random.randint(low, population + 1, elements)
+
+def population(elements, pop, bins, continuous=False, ragged=0.0):
+    '''
+    Generates a population variable NxP.
+
+    Input:
+        elements    number of elements N
+        pop         population P
+        bins        number of bins B
+        continuous  true for continuous values
+        ragged      fraction the population of each element may shrink. Ragged variables
+                    are RaggedArray of N populations, as the readers produce them
+    Returns:
+                    population NxP
+    '''
+    if ragged <= 0:
+        return draw((elements, pop), bins, continuous)
+    sizes = raggedSizes(elements, pop, ragged)
+    offsets = np.zeros(elements + 1, dtype='int64')
+    offsets[1:] = np.cumsum(sizes)
+    return rg.RaggedArray(draw(offsets[-1], bins, continuous), offsets)
+
+def evolve(state, bins, continuous=False, mixing=0.2):
+    '''
+    Advances a state one time step, redrawing a fraction of its values.
+
+    Input:
+        state       population values
+        bins        number of bins B
+        continuous  true for continuous values
+        mixing      probability of redrawing each value
+    Returns:
+                    next state
+    '''
+    redraw = np.random.uniform(size=state.shape) < mixing
+    return np.where(redraw, draw(state.shape, bins, continuous), state)
+
+def timeSeries(steps, elements, pop, bins, continuous=False, mixing=0.2):
+    '''
+    Generates an initial population and its time series.
+
+    Input:
+        steps       number of time steps T
+        elements    number of elements N
+        pop         population P
+        bins        number of bins B
+        continuous  true for continuous values
+        mixing      probability of redrawing each value at each step
+    Returns:
+                    initial NxP, time series TxNxP
+    '''
+    initial = draw((elements, pop), bins, continuous)
+    series = np.empty((steps, elements, pop), dtype=initial.dtype)
+    state = initial
+    for t in xrange(steps):
+        state = evolve(state, bins, continuous, mixing)
+        series[t] = state
+    return initial, series
+
+def groups(groupsNumber, steps, elements, pop, bins, continuous=False, mixing=0.2):
+    '''
+    Generates grouped experiments, each starting with all its population in one initial state.
+
+    Input:
+        groupsNumber    number of groups G
+        steps           number of time steps T
+        elements        number of elements N
+        pop             population P
+        bins            number of bins B
+        continuous      true for continuous values
+        mixing          probability of redrawing each value at each step
+    Returns:
+                        initial states NxG, grouped time series GxTxNxP
+    '''
+    initial = draw((elements, groupsNumber), bins, continuous)
+    group = np.empty((groupsNumber, steps, elements, pop), dtype=initial.dtype)
+    for g in xrange(groupsNumber):
+        state = np.repeat(initial[:, g].reshape(elements, 1), pop, axis=1)
+        for t in xrange(steps):
+            state = evolve(state, bins, continuous, mixing)
+            group[g, t] = state
+    return initial, group
+
+def variables(number, elements, pop, bins, continuous=False, mixing=0.5):
+    '''
+    Generates correlated variables, each a partial redraw of a common one.
+
+    Input:
+        number      number of variables V
+        elements    number of elements N
+        pop         population P
+        bins        number of bins B
+        continuous  true for continuous values
+        mixing      probability of redrawing each value of the common variable
+    Returns:
+                    variables VxNxP
+    '''
+    common = draw((elements, pop), bins, continuous)
+    return np.array([evolve(common, bins, continuous, mixing) for v in xrange(number)])
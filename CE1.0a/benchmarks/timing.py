@@ -0,0 +1,161 @@
+'''
+Common benchmark runner.
+A case is timed several times, from a fixed random seed, and its result recorded as a dictionary:
+    benchmark   benchmark name
+    params      case parameters
+    times       wall seconds of each repetition
+    min         fastest repetition
+    median      median repetition
+    error       exception raised by the case, None if it succeeded
+    skipped     true if a smaller case of the same scaling series went over the time limit
+'''
+
+import os, os.path
+import sys
+import json
+import time
+import platform
+import subprocess
+import traceback
+from collections import namedtuple
+import numpy as np
+
+#One benchmark case. setup(params) prepares the data and returns the function to time, without arguments
+Case = namedtuple('Case', ['benchmark', 'series', 'params', 'setup'])
+
+def grid(base, axes):
+    '''
+    Builds a scaling grid varying one parameter at a time around a base case.
+
+    Input:
+        base    dictionary parameter -> base value
+        axes    dictionary parameter -> list of values, in increasing cost
+    Returns:
+                list of (scaled parameter, parameters). The base case has no scaled parameter
+    '''
+    points = [(None, dict(base))]
+    for axis in sorted(axes):
+        for value in axes[axis]:
+            params = dict(base)
+            params[axis] = value
+            if params != base:
+                points.append((axis, params))
+    return points
+
+def environment():
+    '''
+    Describes the machine and the checkout the benchmark ran on.
+
+    Returns:
+            dictionary
+    '''
+    info = {'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpus': os.sysconf('SC_NPROCESSORS_ONLN') if hasattr(os, 'sysconf') else None,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'commit': None}
+    try:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        with open(os.devnull, 'w') as null:
+            info['commit'] = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=directory, stderr=null).strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+def runCase(case, repeat=3, seed=0):
+    '''
+    Times a case.
+
+    Input:
+        case    Case
+        repeat  number of repetitions
+        seed    random seed set before the setup and before each repetition
+    Returns:
+            result dictionary
+    '''
+    result = {'benchmark': case.benchmark, 'params': case.params, 'times': [], 'min': None, 'median': None, 'error': None, 'skipped': False}
+    try:
+        np.random.seed(seed)
+        function = case.setup(case.params)
+        for r in xrange(repeat):
+            np.random.seed(seed)
+            start = time.time()
+            function()
+            result['times'].append(time.time() - start)
+        result['min'] = min(result['times'])
+        result['median'] = float(np.median(result['times']))
+    except Exception, e:
+        result['error'] = type(e).__name__ + ': ' + str(e)
+        result['traceback'] = traceback.format_exc()
+    return result
+
+def runCases(cases, repeat=3, maxSeconds=None, verbose=True):
+    '''
+    Times a list of cases. Once a case of a scaling series takes longer than maxSeconds,
+    the following cases of the series are skipped.
+
+    Input:
+        cases       list of Case, each series in increasing cost
+        repeat      number of repetitions of each case
+        maxSeconds  time limit of a repetition, None for no limit
+        verbose     true to print each result
+    Returns:
+                    list of result dictionaries
+    '''
+    results = []
+    slow = set()
+    for case in cases:
+        key = (case.benchmark, case.series)
+        if key in slow:
+            result = {'benchmark': case.benchmark, 'params': case.params, 'times': [], 'min': None, 'median': None, 'error': None, 'skipped': True}
+        else:
+            result = runCase(case, repeat)
+            if maxSeconds is not None and case.series is not None and result['min'] is not None and result['min'] > maxSeconds:
+                slow.add(key)
+        results.append(result)
+        if verbose:
+            describe(result)
+    return results
+
+def describe(result):
+    '''
+    Prints a result in one line.
+
+    Input:
+        result  result dictionary
+    '''
+    params = ' '.join(str(key) + '=' + str(result['params'][key]) for key in sorted(result['params']))
+    if result['skipped']:
+        status = 'skipped'
+    elif result['error'] is not None:
+        status = 'ERROR ' + result['error']
+    else:
+        status = '%.6f s' % result['min']
+    print '%-24s %-48s %s' % (result['benchmark'], params, status)
+    sys.stdout.flush()
+
+def writeResults(fileName, results):
+    '''
+    Writes the results with the description of the environment.
+
+    Input:
+        fileName    JSON file name
+        results     list of result dictionaries
+    '''
+    with open(fileName, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1, sort_keys=True)
+
+def readResults(fileName):
+    '''
+    Reads a results file.
+
+    Input:
+        fileName    JSON file name
+    Returns:
+                    dictionary with the environment and the results
+    '''
+    with open(fileName) as f:
+        return json.load(f)
@@ -2,6 +2,10 @@
 
 import numpy as np
 import entropy_shannon as shannon
+import histogram
+
+#Largest number of joint probabilities, or of bin indicators of A or B, held at once by pairwise
+blockSize = 1 << 22
 
 """
 Input:
@@ -26,39 +30,115 @@ def calculate(pdf_a, pdf_b, joint_pdf, logbase="log2"):
     Mutual information metric.
 
     Input:
-        pdf_a       probability A variable NxB
+        pdf_a       probability A variable NxB, optionally with extra leading axes
                         N = elements
                         B = bins
-        pdf_b       probability B variable NxB
+        pdf_b       probability B variable NxB, broadcastable against pdf_a
                         N = elements
                         B = bins
-        joint_pdf   joint pdf
+        joint_pdf   joint pdf, broadcastable against the pdfs
                         N = elements
                         BA = bins A
                         BB = bins B
         logbase        Base for the logarithm ("log2", "log", "log10")
     Returns:
-                    mutual information N
+                    mutual information N, with the leading axes of the parameters
                         N = elements
     '''
     assert logbase in ["log2", "log", "log10"], "Logbase parameter must be one of (\"log2\", \"log\", \"log10\")"
-    assert len(pdf_a) == len(pdf_b), "The mutual information parameters A and B must have the same number of elements"
-    assert len(pdf_a) == len(joint_pdf), "The mutual information parameters A and Joint PDF must have the same number of elements"
+    pdf_a = np.asarray(pdf_a)
+    pdf_b = np.asarray(pdf_b)
+    joint_pdf = np.asarray(joint_pdf)
+    assert pdf_a.shape[-2] == pdf_b.shape[-2], "The mutual information parameters A and B must have the same number of elements"
+    assert pdf_a.shape[-2] == joint_pdf.shape[-3], "The mutual information parameters A and Joint PDF must have the same number of elements"
     log = getattr(np, logbase)
 
-    number_of_binsA = pdf_a.shape[1]
-    number_of_binsB = pdf_b.shape[1]
+    #Only the bins with positive probabilities take part, so the logarithm is taken on them alone
+    prod = pdf_a[..., :, np.newaxis] * pdf_b[..., np.newaxis, :]
+    prod, joint_pdf = np.broadcast_arrays(prod, joint_pdf)
+    positive = (prod > 0) & (joint_pdf > 0)
+    logs = np.zeros(positive.shape, dtype='float')
+    logs[positive] = joint_pdf[positive] * log(joint_pdf[positive] / prod[positive])
+    return np.sum(logs, axis=(-2, -1))
+
+def indicators(index, number_of_bins):
+    '''
+    Builds the bin indicators of a population.
+
+    Input:
+        index           bin index of every value NxP, -1 out of every bin
+        number_of_bins  number of bins B
+    Returns:
+                        (N*B)xP array, 1 where value p of element n is in bin b
+    '''
+    elements, population = index.shape
+    onehot = np.zeros((elements, number_of_bins, population), dtype='float')
+    elem, pop = np.nonzero(index >= 0)
+    onehot[elem, index[elem, pop], pop] = 1
+    return onehot.reshape((elements * number_of_bins, population))
+
+def pairwise(data_a, bin_values_a, continuous_bins_a, data_b, bin_values_b, continuous_bins_b, logbase="log2", rows=None, columns=None):
+    '''
+    Mutual information of every pair of elements of A and B.
+    A and B share the population axis, value p of an element of A is paired with value p of every element of B.
+    The joint counts of all the pairs come from a matrix product of bin indicators,
+    computed for blocks of elements of A and B to bound memory.
+
+    Input:
+        data_a              data variable A NAxP
+                                NA = elements
+                                P = population, NaN values are padding
+        bin_values_a        values of the bins
+        continuous_bins_a   true if the values of the bins are continuous
+        data_b              data variable B NBxP
+                                NB = elements
+                                P = population, NaN values are padding
+        bin_values_b        values of the bins
+        continuous_bins_b   true if the values of the bins are continuous
+        logbase             Base for the logarithm ("log2", "log", "log10")
+        rows                number of elements of A in each block, by default the ones fitting in blockSize
+        columns             number of elements of B in each block, by default the ones fitting in blockSize
+    Returns:
+                        mutual information NAxNB, as calculate with the pdfs of every element and the joint pdf of every pair
+                            NA = elements A
+                            NB = elements B
+    '''
+    assert logbase in ["log2", "log", "log10"], "Logbase parameter must be one of (\"log2\", \"log\", \"log10\")"
+    data_a = np.asarray(data_a, dtype='float')
+    data_b = np.asarray(data_b, dtype='float')
+    assert data_a.ndim == 2 and data_b.ndim == 2 and data_a.shape[1] == data_b.shape[1], "The data parameters A and B must be NxP with the same population"
+    number_of_binsA = histogram.numberOfBins(bin_values_a, continuous_bins_a)
+    number_of_binsB = histogram.numberOfBins(bin_values_b, continuous_bins_b)
+    elementsA = len(data_a)
+    elementsB = len(data_b)
 
-    elements = len(pdf_a)
+    pdf_a = histogram.normalize(*histogram.histogram(data_a, bin_values_a, continuous_bins_a))
+    pdf_b = histogram.normalize(*histogram.histogram(data_b, bin_values_b, continuous_bins_b))
+    #Population of every pair, the values present in both elements
+    population = np.dot((~np.isnan(data_a)).astype('float'), (~np.isnan(data_b)).astype('float').T)
+    index_a = histogram.binIndex(data_a, bin_values_a, continuous_bins_a)
+    index_b = histogram.binIndex(data_b, bin_values_b, continuous_bins_b)
+    population_size = data_a.shape[1]
 
-    mi = np.ndarray(shape=(elements),dtype='float')
-    for elem in xrange(elements):
-        acc = 0
-        for nbA in xrange(number_of_binsA):
-            for nbB in xrange(number_of_binsB):
-                if pdf_a[elem][nbA] * pdf_b[elem][nbB] > 0 and joint_pdf[elem, nbA, nbB] > 0:
-                    acc = acc + joint_pdf[elem, nbA, nbB] * log(joint_pdf[elem, nbA, nbB]/(pdf_a[elem][nbA] * pdf_b[elem][nbB]))
-        mi[elem] = acc
+    #A block of B fits a row of joint probabilities and its indicators, a block of A then fills the rest
+    if columns is None:
+        columns = blockSize // max(number_of_binsB * max(number_of_binsA, population_size), 1)
+    columns = min(max(columns, 1), elementsB)
+    if rows is None:
+        rows = blockSize // max(number_of_binsA * max(columns * number_of_binsB, population_size), 1)
+    rows = max(rows, 1)
+    mi = np.ndarray(shape=(elementsA, elementsB), dtype='float')
+    for first in xrange(0, elementsB, columns):
+        last = min(first + columns, elementsB)
+        onehot_b = indicators(index_b[first:last], number_of_binsB)
+        for start in xrange(0, elementsA, rows):
+            end = min(start + rows, elementsA)
+            counts = np.dot(indicators(index_a[start:end], number_of_binsA), onehot_b.T)
+            #Block RxCxBAxBB, the pairs as elements of calculate
+            counts = counts.reshape((end - start, number_of_binsA, last - first, number_of_binsB)).transpose(0, 2, 1, 3)
+            joint_pdf = histogram.normalize(counts, population[start:end, first:last], 2)
+            block_a = np.broadcast_to(pdf_a[start:end, np.newaxis, :], (end - start, last - first, number_of_binsA))
+            mi[start:end, first:last] = calculate(block_a, pdf_b[first:last], joint_pdf, logbase)
     return mi
 
 def entropies(pdf, cond_pdf, logbase="log2"):
@@ -38,22 +38,21 @@ def calculate(data, bin_values, continuous_bins, sample_var, sample_elems, sampl
     #Select samples
     sampleVar = np.arange(data.shape[0])
     np.random.shuffle(sampleVar)
-    sampleVar = sampleVar[:data.shape[0]*sample_var]
+    sampleVar = sampleVar[:number_of_vars]
     sampleElem = np.arange(data.shape[1])
     np.random.shuffle(sampleElem)
-    sampleElem = sampleElem[:data.shape[1]*sample_elems]
+    sampleElem = sampleElem[:number_of_elements]
 
     #Generate all combinations
     states = [p for p in itertools.product(xrange(number_of_bins), repeat=number_of_vars)]
 
     multi = np.ndarray(shape=(number_of_elements),dtype='float')
-    init = time.clock()
     for elem in xrange(number_of_elements):
         # Population could be different for each element, so sampling must be done here
         population = int(len(data[0][elem])*sample_pop)
         samplePop = np.arange(len(data[0][elem]))
         np.random.shuffle(samplePop)
-        samplePop = samplePop[:data.shape[2]*sample_pop]
+        samplePop = samplePop[:population]
         acc = 0
         for comb in states:
             number_of_pop_joint = 0
@@ -12,13 +12,13 @@ def calculate(pdf, logbase="log2"):
     Shannon entropy
 
     Input:
-        pdf         probability variable NxB
+        pdf         probability variable NxB, optionally with extra leading axes
                         N = elements
                         B = bins
         logbase     Base for the logarithm ("log2", "log", "log10")
 
     Returns:
-                    entropy N
+                    entropy N, with the same leading axes as pdf
                         N = elements
     '''
     assert logbase in ["log2", "log", "log10"], "Logbase parameter must be one of (\"log2\", \"log\", \"log10\")"
@@ -26,10 +26,10 @@ def calculate(pdf, logbase="log2"):
     #Ignore warning from log2(0). It is quicker to compute over all probabilities and correct after that than search positive probability.
     np.seterr(all="ignore")
     logs = log(pdf) * pdf
-    norm = log(pdf.shape[1])
+    norm = log(pdf.shape[-1])
     logs[np.isnan(logs)] = 0.0
     np.seterr(all="warn")
-    logsAcc = -np.sum(logs, axis=1)/norm
+    logsAcc = -np.sum(logs, axis=-1)/norm
     return logsAcc
 
 def conditional(pdf, pdf_cond, logbase="log2"):
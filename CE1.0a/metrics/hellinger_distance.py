@@ -12,14 +12,14 @@ def calculate(pdf_p, pdf_q):
     Hellinger distance metric.
 
     Input:
-        pdf_p       probability p variable NxB
+        pdf_p       probability p variable NxB, optionally with extra leading axes
                         N = elements
                         B = bins
-        pdf_q       probability q variable NxB
+        pdf_q       probability q variable NxB, broadcastable against pdf_p
                         N = elements
                         B = bins
     Returns:
-                    entropy N
+                    entropy N, with the leading axes of the parameters
                         N = elements
     '''
-    return 1.0/np.sqrt(2) * np.sqrt(np.sum(np.power(np.sqrt(pdf_p) - np.sqrt(pdf_q), 2), axis=1))
+    return 1.0/np.sqrt(2) * np.sqrt(np.sum(np.power(np.sqrt(pdf_p) - np.sqrt(pdf_q), 2), axis=-1))
@@ -0,0 +1,149 @@
+'''
+Histogram engine.
+Bins all the values of a population at once and counts every element with a single bincount
+over a combined element and bin index.
+Populations are the last axis of an array, with any leading axes, or ragged populations.
+NaN values are padding: they belong to no bin and are not part of the population.
+'''
+
+import numpy as np
+import ragged
+
+def numberOfBins(bin_values, continuous_bins):
+    '''
+    Gets the number of bins.
+
+    Input:
+        bin_values      values of the bins
+        continuous_bins true if the values of the bins are continuous
+    Returns:
+                        number of bins
+    '''
+    if continuous_bins:
+        return len(bin_values) - 1
+    return len(bin_values)
+
+def binIndex(values, bin_values, continuous_bins):
+    '''
+    Gets the bin of every value.
+    A continuous bin b holds bin_values[b] <= value < bin_values[b + 1], a discrete one value == bin_values[b].
+    Values are compared in their own floating precision, so a float32 value equal to a bin edge
+    written as a Python float is on that edge. Other values are compared as float.
+
+    Input:
+        values          array of values
+        bin_values      values of the bins, increasing if continuous
+        continuous_bins true if the values of the bins are continuous
+    Returns:
+                        bin index of every value, -1 for values out of every bin
+    '''
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        values = values.astype('float')
+    bin_values = np.asarray(bin_values, dtype=values.dtype)
+    number_of_bins = numberOfBins(bin_values, continuous_bins)
+    if number_of_bins <= 0:
+        return np.zeros(values.shape, dtype='int64') - 1
+    if continuous_bins:
+        assert np.all(np.diff(bin_values) >= 0), "The values of continuous bins must be increasing"
+        index = np.searchsorted(bin_values, values, side='right') - 1
+        outside = (index >= number_of_bins) | np.isnan(values)
+    elif np.array_equal(bin_values, np.arange(number_of_bins)):
+        #Bins 0..B-1 are the values themselves
+        with np.errstate(invalid='ignore'):
+            outside = ~((values >= 0) & (values < number_of_bins) & (values == np.floor(values)))
+        index = np.where(outside, -1, values).astype('int64')
+    else:
+        sorter = np.argsort(bin_values, kind='mergesort')
+        ordered = bin_values[sorter]
+        position = np.minimum(np.searchsorted(ordered, values), number_of_bins - 1)
+        index = sorter[position]
+        outside = ordered[position] != values
+    index[outside] = -1
+    return index
+
+def elements(data):
+    '''
+    Gets the values of a population with the element of every value.
+
+    Input:
+        data            array with the population in the last axis, array of objects or RaggedArray
+    Returns:
+                        flat values, element of every value, leading shape
+    '''
+    if not ragged.isRagged(data):
+        data = np.asarray(data)
+        if data.dtype == 'object':
+            data = ragged.fromLists(data)
+    if ragged.isRagged(data):
+        return data.values, data.elementIndex(), data.leading
+    leading = data.shape[:-1]
+    size = int(np.prod(leading))
+    return data.reshape(-1), np.repeat(np.arange(size), data.shape[-1]), leading
+
+def histogram(data, bin_values, continuous_bins):
+    '''
+    Counts the values of every element in every bin.
+
+    Input:
+        data            array with the population in the last axis, array of objects or RaggedArray
+        bin_values      values of the bins
+        continuous_bins true if the values of the bins are continuous
+    Returns:
+                        counts with the leading shape and the bin axis, population with the leading shape
+    '''
+    values, element, leading = elements(data)
+    size = int(np.prod(leading))
+    number_of_bins = numberOfBins(bin_values, continuous_bins)
+    index = binIndex(values, bin_values, continuous_bins)
+    inside = index >= 0
+    counts = np.bincount(element[inside] * number_of_bins + index[inside], minlength=size * number_of_bins)
+    population = np.bincount(element[~np.isnan(values)], minlength=size)
+    return counts.reshape(leading + (number_of_bins,)), population.reshape(leading)
+
+def jointHistogram(data_a, bin_values_a, continuous_bins_a, data_b, bin_values_b, continuous_bins_b):
+    '''
+    Counts the value pairs of every element in every pair of bins.
+    The bins of A and B are combined into a single code a*BB + b, so all the pairs are counted with a single bincount.
+
+    Input:
+        data_a              population A, as in histogram
+        bin_values_a        values of the bins
+        continuous_bins_a   true if the values of the bins are continuous
+        data_b              population B, with the same number of values as A in every element
+        bin_values_b        values of the bins
+        continuous_bins_b   true if the values of the bins are continuous
+    Returns:
+                            counts with the leading shape and the bin axes A and B, population with the leading shape
+    '''
+    values_a, element, leading = elements(data_a)
+    values_b, element_b, leading_b = elements(data_b)
+    assert leading == leading_b and np.array_equal(element, element_b), "The data parameters A and B must have the same population in every element"
+    size = int(np.prod(leading))
+    number_of_binsA = numberOfBins(bin_values_a, continuous_bins_a)
+    number_of_binsB = numberOfBins(bin_values_b, continuous_bins_b)
+    index_a = binIndex(values_a, bin_values_a, continuous_bins_a)
+    index_b = binIndex(values_b, bin_values_b, continuous_bins_b)
+    inside = (index_a >= 0) & (index_b >= 0)
+    codes = (element[inside] * number_of_binsA + index_a[inside]) * number_of_binsB + index_b[inside]
+    counts = np.bincount(codes, minlength=size * number_of_binsA * number_of_binsB)
+    population = np.bincount(element[~(np.isnan(values_a) | np.isnan(values_b))], minlength=size)
+    return counts.reshape(leading + (number_of_binsA, number_of_binsB)), population.reshape(leading)
+
+def normalize(counts, population, axes=1):
+    '''
+    Divides the counts of every element by its population. Elements without population are zero.
+
+    Input:
+        counts          counts with the leading shape and the bin axes
+        population      population with the leading shape
+        axes            number of bin axes
+    Returns:
+                        float array with the shape of counts
+    '''
+    np.seterr(all="ignore")
+    pdf = counts / population.reshape(population.shape + (1,) * axes).astype('float')
+    pdf[np.isnan(pdf)] = 0.0
+    pdf[np.isinf(pdf)] = 0.0
+    np.seterr(all="warn")
+    return pdf
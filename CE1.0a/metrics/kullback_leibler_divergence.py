@@ -11,15 +11,15 @@ def calculate(pdf_p, pdf_q, logbase="log2"):
     Kullback-Leibler divergence metric.
 
     Input:
-        pdf_p       probability p variable NxB
+        pdf_p       probability p variable NxB, optionally with extra leading axes
                         N = elements
                         B = bins
-        pdf_q       probability q variable NxB
+        pdf_q       probability q variable NxB, broadcastable against pdf_p
                         N = elements
                         B = bins
         logbase        Base for the logarithm ("log2", "log", "log10")
     Returns:
-                    entropy N
+                    entropy N, with the leading axes of the parameters
                         N = elements
     '''
     assert logbase in ["log2", "log", "log10"], "Logbase parameter must be one of (\"log2\", \"log\", \"log10\")"
@@ -31,5 +31,5 @@ def calculate(pdf_p, pdf_q, logbase="log2"):
     logs[np.isnan(logs)] = 0.0
     logs[np.isinf(logs)] = 0.0
     np.seterr(all="warn")
-    logsAcc = np.sum(logs, axis=1)
+    logsAcc = np.sum(logs, axis=-1)
     return logsAcc
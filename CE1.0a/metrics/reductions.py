@@ -3,13 +3,14 @@ Utilities for the data management.
 '''
 
 import numpy as np
+import ragged
 
 def count(data):
     '''
     Counts the number of population in a NxP matrix.
 
     Input:
-        data            data variable NxP
+        data            data variable NxP, or a ragged population
                             N = elements
                             P = population
 
@@ -17,6 +18,8 @@ def count(data):
                             N = elements
 
     '''
+    if ragged.isRagged(data):
+        return data.lengths()
     return np.array(map(len, data))
 
 def join(data, axisA, axisB):
@@ -0,0 +1,114 @@
+'''
+Tests of the metric expression parser.
+
+Usage, from any directory:
+    python tests/test_metric_parser.py
+'''
+
+import sys
+import os, os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+import unittest
+import StringIO
+import numpy as np
+import metric_parser as mpar
+
+def constant(value):
+    return ('constant', value, False, [])
+
+def variable(name, temporal=False, index=[]):
+    return ('variable', name, temporal, index)
+
+#Expression, metric name and compiled arguments
+CASES = [
+    #Fields
+    ('x', None, [variable('x')]),
+    ('{x}', None, [variable('x', True)]),
+    ('x[1]', None, [variable('x', False, [(1,)])]),
+    #Constants
+    ('f()', 'f', []),
+    ('f(1, -3, 1.5, 1., -1e3)', 'f', [constant(1), constant(-3), constant(1.5), constant(1.0), constant(-1000.0)]),
+    ('f(True, false, TRUE)', 'f', [constant(True), constant(False), constant(True)]),
+    ('f("log2")', 'f', [constant('log2')]),
+    ('f("a,b", "c(d", "e)f,[g")', 'f', [constant('a,b'), constant('c(d'), constant('e)f,[g')]),
+    ('f(0 1 2, 0.5 1 2.0)', 'f', [constant([0, 1, 2]), constant([0.5, 1, 2.0])]),
+    #Indices
+    ('f(x[0:10, 2])', 'f', [variable('x', False, [(slice(0, 10), 2)])]),
+    ('f(x[0:10, 2][1], y[-1])', 'f', [variable('x', False, [(slice(0, 10), 2), (1,)]), variable('y', False, [(-1,)])]),
+    ('f(x[::2, 1:], x[:, :, 3])', 'f', [variable('x', False, [(slice(None, None, 2), slice(1, None))]), variable('x', False, [(slice(None), slice(None), 3)])]),
+    ('f(x[[1, 2], 0], y[0][[3,4]])', 'f', [variable('x', False, [([1, 2], 0)]), variable('y', False, [(0,), ([3, 4],)])]),
+    ('f(x[..., 0], x[None, :], x[1, ..., None])', 'f', [variable('x', False, [(Ellipsis, 0)]), variable('x', False, [(None, slice(None))]), variable('x', False, [(1, Ellipsis, None)])]),
+    #Temporal variables, the index applied after the time index
+    ('f({x}, {y[1]}, {z}[1])', 'f', [variable('x', True), variable('y', True, [(1,)]), variable('z', True, [(1,)])]),
+    ('f({x[0:2]}[1], {y} [2, 3])', 'f', [variable('x', True, [(slice(0, 2),), (1,)]), variable('y', True, [(2, 3)])]),
+    #Mixed
+    ('pdf_joint(a, 0 1, true, b[1:3], 0.0 0.5 1.0, false)', 'pdf_joint', [variable('a'), constant([0, 1]), constant(True), variable('b', False, [(slice(1, 3),)]), constant([0.0, 0.5, 1.0]), constant(False)]),
+    ('  f ( x ,  "a b" , 2 )  ', 'f', [variable('x'), constant('a b'), constant(2)]),
+]
+
+#Expressions with a parameter that is not correct
+ERRORS = [
+    'f(x[1)',
+    'f(x[a])',
+    'f(x[1.5])',
+    'f(x[1:2:3:4])',
+    'f(x[[1, a]])',
+    'f(x[1]y)',
+    'f(x]1[)',
+    'f(x y z)',
+    'f("")',
+    'f({x}})',
+    'f({x)',
+    'f(x)(y)',
+    '{x}[',
+]
+
+class TestCompile(unittest.TestCase):
+
+    def testCases(self):
+        for expression, name, arguments in CASES:
+            plan = mpar.compileMetric(expression)
+            self.assertEqual(plan.name, name, expression)
+            self.assertEqual([tuple(arg) for arg in plan.arguments], arguments, expression)
+
+    def testErrors(self):
+        for expression in ERRORS:
+            output = StringIO.StringIO()
+            stdout = sys.stdout
+            sys.stdout = output
+            try:
+                self.assertRaises(Exception, mpar.compileMetric, expression)
+            finally:
+                sys.stdout = stdout
+            self.assertTrue(output.getvalue().startswith('ERROR: Error in '), expression)
+
+    def testReferences(self):
+        plan = mpar.compileMetric('f(x, 1, {y}[0], x[1], "z")')
+        self.assertEqual(mpar.references(plan), ['x', 'y'])
+
+class TestEvaluate(unittest.TestCase):
+
+    def setUp(self):
+        self.variables = {'x': np.arange(24.0).reshape(2, 3, 4), 'y': np.arange(5.0)}
+
+    def testIndex(self):
+        plan = mpar.compileMetric('f(x[1][0:2, 3], y[[0, 4]], 2, "a")')
+        values = mpar.evaluateArguments(plan, self.variables, None)
+        self.assertEqual(values[0].tolist(), self.variables['x'][1][0:2, 3].tolist())
+        self.assertEqual(values[1].tolist(), [0.0, 4.0])
+        self.assertEqual(values[2:], [2, 'a'])
+
+    def testTemporal(self):
+        #{x}[i] and {x[i]} both index the time step
+        for expression in ['f({x}[1, 2])', 'f({x[1, 2]})']:
+            plan = mpar.compileMetric(expression)
+            self.assertEqual(mpar.checkTemporal(plan, self.variables), 2)
+            for time in range(2):
+                self.assertEqual(mpar.evaluateArguments(plan, self.variables, time)[0], self.variables['x'][time][1, 2])
+
+    def testWholeSeries(self):
+        plan = mpar.compileMetric('f({x})')
+        self.assertTrue(mpar.evaluateArguments(plan, self.variables, None)[0] is self.variables['x'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+'''
+Tests of the mutual information metrics.
+
+Usage, from any directory:
+    python tests/test_mi.py
+'''
+
+import sys
+import os, os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+import unittest
+import numpy as np
+import PDF
+import MI
+
+def bruteForce(data_a, bin_values_a, continuous_bins_a, data_b, bin_values_b, continuous_bins_b, logbase="log2"):
+    '''
+    Mutual information of every pair of elements, one joint pdf at a time.
+    '''
+    pdf_a = PDF.single(data_a, bin_values_a, continuous_bins_a)
+    pdf_b = PDF.single(data_b, bin_values_b, continuous_bins_b)
+    mi = np.ndarray(shape=(len(data_a), len(data_b)), dtype='float')
+    for i in xrange(len(data_a)):
+        for j in xrange(len(data_b)):
+            joint_pdf = PDF.joint(data_a[i:i + 1], bin_values_a, continuous_bins_a, data_b[j:j + 1], bin_values_b, continuous_bins_b)
+            mi[i, j] = MI.calculate(pdf_a[i:i + 1], pdf_b[j:j + 1], joint_pdf, logbase)[0]
+    return mi
+
+class TestPairwise(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(5)
+        self.dataA = np.random.randint(0, 4, size=(13, 40)).astype('float')
+        self.dataB = (np.random.randint(0, 2, size=(9, 40)) + self.dataA[:9]) % 5
+        #Padding, constant elements and values out of the bins
+        self.dataA[2, :5] = np.nan
+        self.dataB[3, 10:] = np.nan
+        self.dataA[4] = 0
+        self.dataB[5, :3] = 7
+        self.binsA = np.arange(4)
+        self.binsB = np.arange(5)
+        self.blockSize = MI.blockSize
+
+    def tearDown(self):
+        MI.blockSize = self.blockSize
+
+    def testDiscrete(self):
+        for logbase in ["log2", "log", "log10"]:
+            mi = MI.pairwise(self.dataA, self.binsA, False, self.dataB, self.binsB, False, logbase)
+            self.assertTrue(np.allclose(mi, bruteForce(self.dataA, self.binsA, False, self.dataB, self.binsB, False, logbase)))
+
+    def testContinuous(self):
+        dataC = np.random.uniform(-0.1, 1.1, size=(7, 40))
+        dataC[1, ::3] = np.nan
+        bins = np.linspace(0, 1, 5)
+        mi = MI.pairwise(dataC, bins, True, self.dataA, self.binsA, False)
+        self.assertTrue(np.allclose(mi, bruteForce(dataC, bins, True, self.dataA, self.binsA, False)))
+        mi = MI.pairwise(dataC, bins, True, dataC, bins, True)
+        self.assertTrue(np.allclose(mi, bruteForce(dataC, bins, True, dataC, bins, True)))
+
+    def testRowsAndColumns(self):
+        expected = bruteForce(self.dataA, self.binsA, False, self.dataB, self.binsB, False)
+        for rows, columns in [(1, 1), (4, 2), (None, 3), (5, None), (100, 100)]:
+            mi = MI.pairwise(self.dataA, self.binsA, False, self.dataB, self.binsB, False, "log2", rows, columns)
+            self.assertTrue(np.allclose(mi, expected), (rows, columns))
+
+    def testBlocks(self):
+        #A budget smaller than one block of all the elements of B, so both A and B are split
+        expected = bruteForce(self.dataA, self.binsA, False, self.dataB, self.binsB, False)
+        MI.blockSize = 5 * 40 * 2
+        self.assertTrue(MI.blockSize // (len(self.binsB) * 40) < len(self.dataB))
+        mi = MI.pairwise(self.dataA, self.binsA, False, self.dataB, self.binsB, False)
+        self.assertTrue(np.allclose(mi, expected))
+
+if __name__ == '__main__':
+    unittest.main()
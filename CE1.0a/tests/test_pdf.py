@@ -0,0 +1,53 @@
+'''
+Tests of the PDF metrics.
+
+Usage, from any directory:
+    python tests/test_pdf.py
+'''
+
+import sys
+import os, os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+import unittest
+import numpy as np
+import PDF
+
+class TestSingle(unittest.TestCase):
+
+    def testFloat32Edge(self):
+        #0.7 as float32 is below the float 0.7, but it is on the edge of the second bin in its own precision
+        data = np.float32([[0.7, 0.7, 0.7, 0.2]])
+        self.assertEqual(PDF.single(data, [0, 0.7, 1.0], True).tolist(), [[0.25, 0.75]])
+
+    def testFloat32Discrete(self):
+        data = np.float32([[0.7, 0.7, 0.2, 0.3]])
+        self.assertEqual(PDF.single(data, [0.2, 0.7], False).tolist(), [[0.25, 0.5]])
+
+class TestJoint(unittest.TestCase):
+
+    def testFloat32Edge(self):
+        dataA = np.float32([[0.7, 0.7, 0.2, 0.2]])
+        dataB = np.float32([[0.7, 0.2, 0.7, 0.2]])
+        pdf = PDF.joint(dataA, [0, 0.7, 1.0], True, dataB, [0, 0.7, 1.0], True)
+        self.assertEqual(pdf.tolist(), [[[0.25, 0.25], [0.25, 0.25]]])
+
+class TestConditional(unittest.TestCase):
+
+    def testOutOfBinsB(self):
+        #Pairs with B out of every bin or NaN are not part of the conditional population
+        dataA = np.array([[0.1, 0.1, 0.1, 0.1, 0.6, 0.6, 0.6]])
+        dataB = np.array([[0.2, 0.7, 1.5, np.nan, 0.2, -1.0, np.nan]])
+        pdf = PDF.conditional(dataA, [0, 0.5, 1.0], True, dataB, [0, 0.5, 1.0], True)
+        self.assertEqual(pdf.tolist(), [[[0.5, 0.5], [1.0, 0.0]]])
+
+    def testRowsSumToOne(self):
+        np.random.seed(0)
+        dataA = np.random.randint(0, 3, size=(4, 50)).astype('float')
+        dataB = np.random.uniform(-0.5, 1.5, size=(4, 50))
+        dataB[:, ::7] = np.nan
+        pdf = PDF.conditional(dataA, [0, 1, 2], False, dataB, [0, 0.5, 1.0], True)
+        self.assertTrue(np.allclose(pdf.sum(axis=-1), 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+'''
+Tests of the ragged populations.
+
+Usage, from any directory:
+    python tests/test_ragged.py
+'''
+
+import sys
+import os, os.path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+import unittest
+import shutil
+import tempfile
+import h5py
+import numpy as np
+import ragged
+
+def assertRaggedEqual(test, data, expected):
+    test.assertTrue(ragged.isRagged(data))
+    test.assertEqual(data.leading, expected.leading)
+    test.assertEqual(data.offsets.tolist(), expected.offsets.tolist())
+    test.assertTrue(np.array_equal(data.values, expected.values))
+
+class TestInvariants(unittest.TestCase):
+
+    def testOffsets(self):
+        data = ragged.RaggedArray([1.0, 2.0, 3.0], [0, 2, 2, 3])
+        self.assertEqual(data.size, 3)
+        self.assertEqual(data.leading, (3,))
+        self.assertEqual(data.width, 2)
+        self.assertEqual(data.shape, (3, 2))
+        self.assertEqual(data.ndim, 2)
+        self.assertEqual(data.lengths().tolist(), [2, 0, 1])
+        self.assertEqual(data.elementIndex().tolist(), [0, 0, 2])
+
+    def testLeadingShape(self):
+        data = ragged.RaggedArray(np.arange(6.0), [0, 1, 1, 3, 3, 5, 6], (2, 3))
+        self.assertEqual(data.shape, (2, 3, 2))
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data.lengths().tolist(), [[1, 0, 2], [0, 2, 1]])
+
+    def testWrongOffsets(self):
+        #One offset per element plus the total, the total being the number of values
+        self.assertRaises(AssertionError, ragged.RaggedArray, [1.0, 2.0], [0, 1])
+        self.assertRaises(AssertionError, ragged.RaggedArray, [1.0, 2.0], [0, 1, 3])
+        self.assertRaises(AssertionError, ragged.RaggedArray, [1.0, 2.0], [0, 1, 2], (3,))
+
+    def testEmpty(self):
+        data = ragged.fromLists([])
+        self.assertEqual(data.size, 0)
+        self.assertEqual(data.width, 0)
+        self.assertEqual(data.values.tolist(), [])
+
+    def testDense(self):
+        data = ragged.fromLists([[1, 2], [], [3]])
+        dense = data.dense()
+        self.assertEqual(dense.shape, (3, 2))
+        self.assertEqual(dense[0].tolist(), [1.0, 2.0])
+        self.assertTrue(np.all(np.isnan(dense[1])))
+        self.assertEqual(dense[2, 0], 3.0)
+        self.assertEqual(data.dense(0).tolist(), [[1.0, 2.0], [0.0, 0.0], [3.0, 0.0]])
+        self.assertEqual(np.asarray(data, dtype='float').shape, (3, 2))
+
+class TestIndexing(unittest.TestCase):
+
+    def setUp(self):
+        self.lists = [[1, 2], [], [3], [4, 5, 6], [7], []]
+        self.data = ragged.fromLists(self.lists)
+
+    def testElement(self):
+        for i, values in enumerate(self.lists):
+            self.assertEqual(self.data[i].tolist(), values)
+        self.assertEqual(self.data[-3].tolist(), [4, 5, 6])
+
+    def testSlices(self):
+        part = self.data[1:4]
+        self.assertEqual(part.leading, (3,))
+        self.assertEqual([part[i].tolist() for i in range(3)], self.lists[1:4])
+        part = self.data[::2]
+        self.assertEqual([part[i].tolist() for i in range(3)], self.lists[::2])
+
+    def testTake(self):
+        ids = np.array([[3, 0], [5, 3]])
+        part = self.data.take(ids)
+        self.assertEqual(part.leading, (2, 2))
+        self.assertEqual(part[0, 0].tolist(), [4, 5, 6])
+        self.assertEqual(part[0, 1].tolist(), [1, 2])
+        self.assertEqual(part[1, 0].tolist(), [])
+        self.assertEqual(part[1, 1].tolist(), [4, 5, 6])
+
+    def testLeadingAxes(self):
+        objects = np.empty((2, 3), dtype='object')
+        for k in range(6):
+            objects.flat[k] = np.arange(k)
+        data = ragged.fromLists(objects)
+        self.assertEqual(data.leading, (2, 3))
+        self.assertEqual(data[1, 2].tolist(), [0, 1, 2, 3, 4])
+        row = data[1]
+        self.assertEqual(row.leading, (3,))
+        self.assertEqual(row[0].tolist(), [0, 1, 2])
+        column = data[:, 1]
+        self.assertEqual([column[i].tolist() for i in range(2)], [[0], [0, 1, 2, 3]])
+
+    def testPopulationAxis(self):
+        #An index reaching the population axis is applied to the padded population
+        self.assertEqual(self.data[3, 1], 5.0)
+        self.assertTrue(np.isnan(self.data[2, 1]))
+        self.assertEqual(self.data[..., 0].shape, (6,))
+
+class TestBuilders(unittest.TestCase):
+
+    def testFromDense(self):
+        dense = np.arange(12.0).reshape(2, 3, 2)
+        data = ragged.fromDense(dense)
+        self.assertEqual(data.leading, (2, 3))
+        self.assertEqual(data.offsets.tolist(), range(0, 13, 2))
+        self.assertTrue(np.array_equal(data.dense(), dense))
+        #Views with strides are copied in C order
+        data = ragged.fromDense(dense.transpose(1, 0, 2))
+        self.assertTrue(np.array_equal(data.dense(), dense.transpose(1, 0, 2)))
+
+    def testAsRagged(self):
+        data = ragged.fromLists([[1], [2, 3]])
+        self.assertTrue(ragged.asRagged(data) is data)
+        objects = np.empty(2, dtype='object')
+        objects[0] = np.array([1.0])
+        objects[1] = np.array([2.0, 3.0])
+        assertRaggedEqual(self, ragged.asRagged(objects), data)
+        self.assertEqual(ragged.asRagged(np.ones((2, 3))).offsets.tolist(), [0, 3, 6])
+
+    def testStack(self):
+        steps = [ragged.fromLists([[1], [], [2, 3]]), ragged.fromLists([[], [4, 5], [6]]), ragged.fromLists([[7], [8], []]), ragged.fromLists([[], [], []])]
+        data = ragged.stack(steps)
+        self.assertEqual(data.leading, (4, 3))
+        for t, step in enumerate(steps):
+            for i in range(3):
+                self.assertEqual(data[t, i].tolist(), step[i].tolist())
+        data = ragged.stack(steps, (2, 2))
+        self.assertEqual(data.leading, (2, 2, 3))
+        self.assertEqual(data[1, 0, 1].tolist(), [8])
+
+    def testStackShapes(self):
+        self.assertRaises(AssertionError, ragged.stack, [ragged.fromLists([[1]]), ragged.fromLists([[1], [2]])])
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cases = [ragged.fromLists([[1.5, 2.5], [], [3.5], []]),
+                      ragged.stack([ragged.fromLists([[], [1, 2]]), ragged.fromLists([[3], []])]),
+                      ragged.fromLists([[], [], []]),
+                      ragged.fromLists([])]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testHDF5(self):
+        fileName = os.path.join(self.directory, 'data.h5')
+        f = h5py.File(fileName, 'w')
+        for i, data in enumerate(self.cases):
+            ragged.writeHDF5(f, 'case' + str(i), data)
+        f.create_dataset('dense', data=np.zeros(3))
+        f.close()
+        f = h5py.File(fileName, 'r')
+        try:
+            self.assertFalse(ragged.isRaggedGroup(f['dense']))
+            for i, data in enumerate(self.cases):
+                self.assertTrue(ragged.isRaggedGroup(f['case' + str(i)]))
+                assertRaggedEqual(self, ragged.readHDF5(f['case' + str(i)]), data)
+        finally:
+            f.close()
+
+    def testNpz(self):
+        for i, data in enumerate(self.cases):
+            fileName = os.path.join(self.directory, 'case' + str(i) + '.npz')
+            ragged.save(fileName, data)
+            assertRaggedEqual(self, ragged.load(fileName), data)
+
+    def testNpzOpenFile(self):
+        fileName = os.path.join(self.directory, 'open.npz')
+        with open(fileName, 'wb') as f:
+            ragged.save(f, self.cases[1])
+        assertRaggedEqual(self, ragged.load(fileName), self.cases[1])
+
+if __name__ == '__main__':
+    unittest.main()
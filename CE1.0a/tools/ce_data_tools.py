@@ -10,7 +10,7 @@ import numpy as np
 import os, os.path
 import ConfigParser
 import sys
-import scipy.ndimage as ndimage
+import ragged
 import utils as u
 
 def isCEData(parameters, variable):
@@ -60,7 +60,7 @@ def readCEData(parameters, variable):
                 stat_step = eval(parameters.get(variable, 'stat_step'))
         if parameters.has_option(variable, 'time_from'):
             time_from = eval(parameters.get(variable, 'time_from'))
-            time_to = eval(parameters.get(variable, 'stat_to'))
+            time_to = eval(parameters.get(variable, 'time_to'))
             time_step = 1
             if parameters.has_option(variable, 'time_step'):
                 time_step = eval(parameters.get(variable, 'time_step'))
@@ -89,28 +89,23 @@ def readCEData(parameters, variable):
                 aux_init_data = readField(fileName, field)
         if dimesionsToAdd == 1:
             if popType == 'spatial':
-                if fileName.count('[T]') == 1:
+                if fileName.count('[T]') != 1:
                     print 'ERROR: Spatial population for variable ' + variable + ' must have "[T]" wildcard.'
                 try:
                     time_from = eval(parameters.get(variable, 'time_from'))
                     time_to = eval(parameters.get(variable, 'time_to'))
-                    initial = True
-                    i = 0
+                    steps = []
                     for index in np.arange(time_from, time_to + time_step, time_step):
                         fName = fileName.replace('[T]', str(index))
-                        tmp = readSpatialData(fName, field, parameters, variable)
-                        if initial:
-                            aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                            initial = False
-                        aux_init_data[i, :] = tmp[:]
-                        i = i + 1
+                        steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps)
                 except ValueError as e:
                     print 'ERROR: ', e
 
                 except ConfigParser.NoOptionError:
                     print 'ERROR: Error in ', variable, '. Spatial population must have time_from and time_to configurations.'
             if popType == 'statistical':
-                if fileName.count('[P]') == 1:
+                if fileName.count('[P]') != 1:
                     print 'ERROR: Statistical population for variable ' + variable + ' must have "[P]" wildcard.'
                 try:
                     initial = True
@@ -119,7 +114,7 @@ def readCEData(parameters, variable):
                         fName = fileName.replace('[P]', str(index_stat))
                         var = readField (fName, field)
                         if initial:
-                            aux_init_data = np.ndarray(shape=(var.shape + (round((stat_to - stat_from)/stat_step + 1),)), dtype='float')
+                            aux_init_data = np.ndarray(shape=(var.shape + (int(round((stat_to - stat_from)/stat_step + 1)),)), dtype='float')
                             initial = False
                         aux_init_data[..., i] = var
                         i = i + 1
@@ -132,28 +127,24 @@ def readCEData(parameters, variable):
                     print 'ERROR: Error in ', variable, '. Statistical population must have stat_from and stat_to configurations.'    
         if dimesionsToAdd == 2:
             if popType == 'spatial':
-                if fileName.count('[T]') == 1 or fileName.count('[G]') == 1:
+                if fileName.count('[T]') != 1 or fileName.count('[G]') != 1:
                     print 'ERROR: Spatial population for variable ' + variable + ' must have "[T]" and "[G]" wildcards.'
-                    initial = True
-                    i = 0
-                    for index_group in np.arange(group_from, group_to + group_step, group_step):
-                        j = 0
-                        for index_time in np.arange(time_from, time_to + time_step, time_step):
+                try:
+                    groups = np.arange(group_from, group_to + group_step, group_step)
+                    times = np.arange(time_from, time_to + time_step, time_step)
+                    steps = []
+                    for index_group in groups:
+                        for index_time in times:
                             fName = fileName.replace('[T]', str(index_time)).replace('[G]', str(index_group))
-                            tmp = readSpatialData(fName, field, parameters, variable)
-                            if initial:
-                                aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                                initial = False
-                            aux_init_data[i, j, :] = tmp[:]
-                            j = j + 1
-                        i = i + 1
+                            steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps, (len(groups), len(times)))
                 except ValueError as e:
                     print 'ERROR: ', e
 
                 except ConfigParser.NoOptionError:
                     print 'ERROR: Error in ', variable, '. Spatial population must have group_from, group_to, time_from and time_to configurations.'
             if popType == 'statistical':
-                if fileName.count('[P]') == 1 or fileName.count('[T]') == 1:
+                if fileName.count('[P]') != 1 or fileName.count('[T]') != 1:
                     print 'ERROR: Statistical population for variable ' + variable + ' must have "[P]" and "[T]" wildcards.'
                 try:
                     initial = True
@@ -164,7 +155,7 @@ def readCEData(parameters, variable):
                             fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time))
                             var = readField (fName, field)
                             if initial:
-                                aux_init_data = np.ndarray(shape=((round((time_to - time_from)/time_step + 1),) + var.shape + (round((stat_to - stat_from)/stat_step + 1),)), dtype='float')
+                                aux_init_data = np.ndarray(shape=((int(round((time_to - time_from)/time_step + 1)),) + var.shape + (int(round((stat_to - stat_from)/stat_step + 1)),)), dtype='float')
                                 initial = False
                             aux_init_data[i, ..., j] = var
                             j = j + 1
@@ -179,7 +170,7 @@ def readCEData(parameters, variable):
             if popType == 'spatial':
                 print 'ERROR: Error in ', variable, '. Cannot add more than 2 extra dimensions to the spatial data provided.'
             if popType == 'statistical':
-                if fileName.count('[P]') == 1 or fileName.count('[T]') == 1 or fileName.count('[G]') == 1:
+                if fileName.count('[P]') != 1 or fileName.count('[T]') != 1 or fileName.count('[G]') != 1:
                     print 'ERROR: Statistical population for variable ' + variable + ' must have "[P]", "[G]" and "[T]" wildcards.'
                 try:
                     initial = True
@@ -192,7 +183,7 @@ def readCEData(parameters, variable):
                                 fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time)).replace('[G]', str(index_group))
                                 var = readField (fName, field)
                                 if initial:
-                                    aux_init_data = np.ndarray(shape=((round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1),) + var.shape + (round((stat_to - stat_from)/stat_step + 1),)), dtype='float')
+                                    aux_init_data = np.ndarray(shape=((int(round((group_to - group_from)/group_step + 1)), int(round((time_to - time_from)/time_step + 1)),) + var.shape + (int(round((stat_to - stat_from)/stat_step + 1)),)), dtype='float')
                                     initial = False
                                 aux_init_data[i, j, ..., k] = var
                                 k = k + 1
@@ -209,16 +200,13 @@ def readCEData(parameters, variable):
         print 'ERROR: ', e
 
 
-def neighboursFilter(arr, **kwargs):
-    '''
-    Filter used to make list from neighbours.
-    '''
-    return arr.tolist()
-
 def readSpatialData(fileName, field, parameters, variable):
     '''
     Reads a field from the file spatially.
-    The neighbours field values of a cell N are stored in a list.
+    The neighbours field values of every cell are kept in a ragged population.
+    The neighbourhood is a window of stencil cells in every axis, placed as scipy.ndimage filters place it:
+    stencil // 2 cells before the cell. Periodical fields, the default, wrap around their boundaries,
+    otherwise the windows are clipped at them.
 
     Input:
         fileName    data file name
@@ -226,12 +214,15 @@ def readSpatialData(fileName, field, parameters, variable):
         parameters  configParser parameters
         variable    CE variable to read
     Returns:
-                    list of values of every cell
+                    RaggedArray with the neighbour values of every cell
     '''
     stencil = parameters.getint(variable, 'stencil')
+    periodical = True
+    if parameters.has_option(variable, 'periodical'):
+        periodical = parameters.getboolean(variable, 'periodical')
     var = readField (fileName, field)
-    aux_init_data = ndimage.generic_filter(var, neighboursFilter, size=stencil, mode='wrap')
-    return aux_init_data
+    windows, mask = u.paddedWindows(var, stencil // 2, stencil, periodical)
+    return u.windowPopulation(windows, mask)
 
 def readField (folder, field):
     '''
@@ -241,11 +232,14 @@ def readField (folder, field):
         folder      data folder name
         field       field to read
     Returns:
-                    the field of each cell
+                    the field of each cell, a RaggedArray if it was written as a ragged population
     '''
     #Read mesh information
     hdf = h5py.File(folder, mode='r')
-    data = hdf[field][()]
+    if ragged.isRaggedGroup(hdf[field]):
+        data = ragged.readHDF5(hdf[field])
+    else:
+        data = hdf[field][()]
     hdf.close()
     return data
 
@@ -260,7 +254,10 @@ def getDataDims (folder, field):
                     the dimensions of the field
     '''
     hdf = h5py.File(folder, mode='r')
-    data = hdf[field][()]
+    if ragged.isRaggedGroup(hdf[field]):
+        dims = len(hdf[field].attrs['shape']) + 1
+    else:
+        dims = len(hdf[field].shape)
     hdf.close()
-    return len(data.shape)
+    return dims
 
@@ -6,11 +6,34 @@ Implements the reader for Boost's DOT output.
 import numpy as np
 import networkx as nx
 import os, os.path
+import re
+import zlib
 import ConfigParser
+import ragged
+from collections import namedtuple
 from subprocess import call
 import pygraphviz as pgv
 import utils as u
 
+#Fields of a graph read by scanDot. Node values and ranks, the order of first appearance, are indexed by the node id.
+#Edges are in file order. The checksum of the edge statements, without their attributes, identifies the edges
+DotGraph = namedtuple('DotGraph', ['nodes', 'rank', 'values', 'edges', 'checksum', 'sources', 'targets', 'edgeValues'])
+#Adjacency of a graph in CSR form: the neighbours of node i are neighbours[offsets[i]:offsets[i + 1]].
+#Node and edge counts and the checksum of the edge statements identify the graph
+GraphTopology = namedtuple('GraphTopology', ['nodes', 'edges', 'checksum', 'offsets', 'neighbours'])
+
+#DOT identifiers: names, numerals and quoted strings
+DOT_ID = r'(?:[A-Za-z_][\w]*|-?(?:\.\d+|\d+(?:\.\d*)?)|"(?:[^"\\]|\\.)*")'
+DOT_HEADER = re.compile(r'^\s*(strict\s+)?(di)?graph\s*(?:' + DOT_ID + r')?\s*\{\s*$', re.IGNORECASE)
+DOT_CLOSE = re.compile(r'^\s*\}\s*;?\s*$')
+DOT_NODE = re.compile(r'^\s*(' + DOT_ID + r')\s*(?:\[(.*)\])?\s*;?\s*$')
+DOT_EDGE = re.compile(r'^\s*(' + DOT_ID + r')\s*(->|--)\s*(' + DOT_ID + r')\s*(?:\[(.*)\])?\s*;?\s*$')
+DOT_GRAPH_ATTR = re.compile(r'^\s*' + DOT_ID + r'\s*=\s*' + DOT_ID + r'\s*;?\s*$')
+DOT_ATTRS = re.compile(r'^\s*(?:' + DOT_ID + r'\s*=\s*' + DOT_ID + r'\s*(?:[,;]\s*)?)*$')
+DOT_PAIR = re.compile(r'(' + DOT_ID + r')\s*=\s*(' + DOT_ID + r')')
+DOT_NODE_NAME = re.compile(r'^"?n(\d+)"?$')
+DOT_KEYWORDS = ['node', 'edge', 'graph', 'digraph', 'subgraph', 'strict']
+
 def isGraph(parameters, variable):
     '''
     Checks the format.
@@ -65,7 +88,7 @@ def readGraphData(parameters, variable):
                         fName = fileName.replace('[P]', str(index))
                         g = readGraphField(fName, field, fieldType)
                         if initial:
-                            aux_init_data = np.ndarray(shape=(len(g), round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                            aux_init_data = np.ndarray(shape=(len(g), int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                             initial = False
                         aux_init_data[:, i] = g[:]
                         i = i + 1
@@ -81,22 +104,18 @@ def readGraphData(parameters, variable):
                 assert fieldType == 'node', 'ERROR: Edge, ' + field + ', population cannot be spatial.'
                 assert fileName.count('[T]') == 1, 'ERROR: Spatial population for variable ' + variable + ' must have "[T]" wildcard.'
                 aux_init_data = []
+                topology = {}
                 try:
                     time_from = eval(parameters.get(variable, 'time_from'))
                     time_to = eval(parameters.get(variable, 'time_to'))
                     time_step = 1
                     if parameters.has_option(variable, 'time_step'):
                         time_step = eval(parameters.get(variable, 'time_step'))
-                    initial = True
-                    i = 0
+                    steps = []
                     for index in np.arange(time_from, time_to + time_step, time_step):
                         fName = fileName.replace('[T]', str(index))
-                        tmp = readGraphFieldSpatial(fName, field)
-                        if initial:
-                            aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                            initial = False
-                        aux_init_data[i, :] = tmp[:]
-                        i = i + 1
+                        steps.append(readGraphFieldSpatial(fName, field, topology))
+                    aux_init_data = ragged.stack(steps)
                 except ValueError as e:
                     print 'ERROR: ', e
                     
@@ -126,7 +145,7 @@ def readGraphData(parameters, variable):
                             print fName
                             g = readGraphField(fName, field, fieldType)
                             if initial:
-                                aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), len(g), round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                aux_init_data = np.ndarray(shape=(int(round((time_to - time_from)/time_step + 1)), len(g), int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                 initial = False
                             aux_init_data[i, :, j] = g[:]
                             j = j + 1
@@ -144,6 +163,7 @@ def readGraphData(parameters, variable):
                 assert fileName.count('[T]') == 1, 'ERROR: Spatial population for variable ' + variable + ' must have "[T]" wildcard.'
                 assert fileName.count('[G]') == 1, 'ERROR: Spatial population for variable ' + variable + ' must have "[G]" wildcard.'
                 aux_init_data = []
+                topology = {}
                 try:
                     time_from = eval(parameters.get(variable, 'time_from'))
                     time_to = eval(parameters.get(variable, 'time_to'))
@@ -155,19 +175,14 @@ def readGraphData(parameters, variable):
                     group_step = 1
                     if parameters.has_option(variable, 'group_step'):
                         group_step = eval(parameters.get(variable, 'group_step'))
-                    initial = True
-                    i = 0
-                    for index_g in np.arange(group_from, group_to + group_step, group_step):
-                        j = 0
-                        for index_t in np.arange(time_from, time_to + time_step, time_step):
+                    groups = np.arange(group_from, group_to + group_step, group_step)
+                    times = np.arange(time_from, time_to + time_step, time_step)
+                    steps = []
+                    for index_g in groups:
+                        for index_t in times:
                             fName = fileName.replace('[T]', str(index_t)).replace('[G]', str(index_g))
-                            tmp = readGraphFieldSpatial(fName, field)
-                            if initial:
-                                aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                                initial = False
-                            aux_init_data[i, j, :] = tmp[:]
-                            j = j + 1
-                        i = i + 1
+                            steps.append(readGraphFieldSpatial(fName, field, topology))
+                    aux_init_data = ragged.stack(steps, (len(groups), len(times)))
                 except ValueError as e:
                     print 'ERROR: ', e
                     
@@ -204,7 +219,7 @@ def readGraphData(parameters, variable):
                                 fName = fileName.replace('[P]', str(index_s)).replace('[T]', str(index_t)).replace('[G]', str(index_g))
                                 g = readGraphField(fName, field, fieldType)
                                 if initial:
-                                    aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), var.shape[0], round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                    aux_init_data = np.ndarray(shape=(int(round((group_to - group_from)/group_step + 1)), int(round((time_to - time_from)/time_step + 1)), len(g), int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                     initial = False
                                 aux_init_data[i, j, :, k] = g[:]
                                 k = k + 1
@@ -222,9 +237,175 @@ def readGraphData(parameters, variable):
     except Exception as e:
         print 'ERROR: ', e
 
+def dotValue(value):
+    '''
+    Converts a DOT attribute value to a number.
+
+    Input:
+        value       attribute value, optionally quoted
+    Returns:
+                    float, None if it is not a number
+    '''
+    if value.startswith('"'):
+        value = value[1:-1]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def scanDot(fileName, nodeField=None, edgeField=None, edges=True):
+    '''
+    Reads the nodes, edges and one node and edge attribute of a DOT file in a single pass, without building the graph.
+    It supports the output of Boost's write_graphviz: one statement per line, nodes named n<i>.
+    Subgraphs, ports, HTML labels, edge chains, default attribute statements, comments and
+    strict graphs are not supported.
+    Without edges, the edge statements are only counted and checksummed, so they are not validated:
+    the result is only meaningful when its checksum matches a graph scanned with edges.
+
+    Input:
+        fileName    DOT file name
+        nodeField   node attribute to read, None for none
+        edgeField   edge attribute to read, None for none
+        edges       false to skip reading the edges, their sources, targets and values are None
+    Returns:
+                    DotGraph, None if the file uses a construct not supported or lacks a value
+    '''
+    size = 1024
+    values = np.empty(size, dtype='float')
+    #Order of the first appearance of each node, -1 if not seen
+    rank = np.empty(size, dtype='int64')
+    rank.fill(-1)
+    nodes = 0
+    edgeCount = 0
+    checksum = 0
+    sources = []
+    targets = []
+    edgeValues = []
+    header = False
+    closed = False
+
+    def nodeId(name):
+        match = DOT_NODE_NAME.match(name)
+        if match is None:
+            return None
+        return int(match.group(1))
+
+    with open(fileName, 'r') as f:
+        for line in f:
+            if line.strip() == '':
+                continue
+            if closed:
+                return None
+            if not header:
+                match = DOT_HEADER.match(line)
+                if match is None or match.group(1) is not None:
+                    return None
+                header = True
+                continue
+            if line.count('//') or line.count('/*') or line.lstrip().startswith('#'):
+                return None
+            if DOT_CLOSE.match(line):
+                closed = True
+                continue
+            if not edges and (line.count('->') or line.count('--')):
+                edgeCount = edgeCount + 1
+                checksum = zlib.crc32(line.split('[', 1)[0].strip(), checksum)
+                continue
+            edge = DOT_EDGE.match(line)
+            if edge is not None:
+                ends = [nodeId(edge.group(1)), nodeId(edge.group(3))]
+                attrs = edge.group(4)
+            else:
+                node = DOT_NODE.match(line)
+                if node is None:
+                    if DOT_GRAPH_ATTR.match(line):
+                        continue
+                    return None
+                if node.group(1).lower() in DOT_KEYWORDS:
+                    return None
+                ends = [nodeId(node.group(1))]
+                attrs = node.group(2)
+            if None in ends:
+                return None
+            if attrs is not None and DOT_ATTRS.match(attrs) is None:
+                return None
+            pairs = dict(DOT_PAIR.findall(attrs)) if attrs is not None else {}
+            #Grow the node arrays to the largest id
+            top = max(ends)
+            if top >= size:
+                while top >= size:
+                    size = size * 2
+                values = np.resize(values, size)
+                grown = np.empty(size, dtype='int64')
+                grown.fill(-1)
+                grown[:len(rank)] = rank
+                rank = grown
+            for n in ends:
+                if rank[n] < 0:
+                    rank[n] = nodes
+                    values[n] = np.nan
+                    nodes = nodes + 1
+            if edge is not None:
+                edgeCount = edgeCount + 1
+                checksum = zlib.crc32(line.split('[', 1)[0].strip(), checksum)
+                sources.append(ends[0])
+                targets.append(ends[1])
+                if edgeField is not None:
+                    value = dotValue(pairs.get(edgeField, ''))
+                    if value is None:
+                        return None
+                    edgeValues.append(value)
+            elif nodeField is not None and nodeField in pairs:
+                value = dotValue(pairs[nodeField])
+                if value is None:
+                    return None
+                values[ends[0]] = value
+    if not closed:
+        return None
+    #Node ids must be 0..N-1
+    if nodes > 0 and np.any(rank[:nodes] < 0):
+        return None
+    values = values[:nodes]
+    if nodeField is not None and np.any(np.isnan(values)):
+        return None
+    if not edges:
+        return DotGraph(nodes, rank[:nodes], values if nodeField is not None else None, edgeCount, checksum & 0xffffffff, None, None, None)
+    edgeValues = np.array(edgeValues, dtype='float') if edgeField is not None else None
+    return DotGraph(nodes, rank[:nodes], values if nodeField is not None else None, edgeCount, checksum & 0xffffffff, np.array(sources, dtype='int64'), np.array(targets, dtype='int64'), edgeValues)
+
+def edgeOrder(graph):
+    '''
+    Gets the order pygraphviz lists the edges in: grouped by source, in order of appearance of the source.
+
+    Input:
+        graph   DotGraph
+    Returns:
+                indices of the edges
+    '''
+    return np.argsort(graph.rank[graph.sources], kind='mergesort')
+
+def buildTopology(graph):
+    '''
+    Builds the adjacency of a graph. The neighbours of a node are listed as pygraphviz iterneighbors does:
+    the targets of its out edges, then the sources of its in edges, both in file order. Loops are listed once.
+
+    Input:
+        graph   DotGraph
+    Returns:
+                GraphTopology
+    '''
+    inEdges = graph.sources != graph.targets
+    node = np.concatenate((graph.sources, graph.targets[inEdges]))
+    neighbours = np.concatenate((graph.targets, graph.sources[inEdges]))
+    order = np.argsort(node, kind='mergesort')
+    offsets = np.zeros(graph.nodes + 1, dtype='int64')
+    offsets[1:] = np.cumsum(np.bincount(node, minlength=graph.nodes))
+    return GraphTopology(graph.nodes, graph.edges, graph.checksum, offsets, neighbours[order])
+
 def readGraphField(fileName, field, fieldType):
     '''
     Reads a field from the file.
+    Files written as Boost does are scanned directly, other DOT files are parsed with pygraphviz.
 
     Input:
         folder      data folder name
@@ -233,6 +414,14 @@ def readGraphField(fileName, field, fieldType):
     Returns:
                     the field of each node
     '''
+    if fieldType == 'edge':
+        graph = scanDot(fileName, edgeField=field)
+        if graph is not None:
+            return graph.edgeValues[edgeOrder(graph)]
+    elif fieldType == 'node':
+        graph = scanDot(fileName, nodeField=field)
+        if graph is not None:
+            return graph.values
     Gtmp = pgv.AGraph(fileName)
     if fieldType == 'edge':
         tmp = np.ndarray(Gtmp.number_of_edges(), dtype='float')
@@ -247,17 +436,37 @@ def readGraphField(fileName, field, fieldType):
     Gtmp.close()
     return tmp
 
-def readGraphFieldSpatial(fileName, field):
+def readGraphFieldSpatial(fileName, field, cache=None):
     '''
     Reads a field from the file spatially.
-    The neighbours field values of a node N are stored in a list.
+    The neighbours field values of every node are kept in a ragged population.
+    The adjacency is kept in the cache and reused for the following files of the same graph,
+    so only the node values are read from them. Their edge statements are checksummed, not parsed.
 
     Input:
         fileName    data file name
         field       field to read
+        cache       dictionary kept between the files of a variable, None for no cache
     Returns:
-                    list of values of every node
+                    RaggedArray with the neighbour values of every node
     '''
+    topology = cache.get('topology') if cache is not None else None
+    graph = None
+    if topology is not None:
+        graph = scanDot(fileName, nodeField=field, edges=False)
+        if graph is None or (graph.nodes, graph.edges, graph.checksum) != (topology.nodes, topology.edges, topology.checksum):
+            #Not the cached graph, its edges are read
+            graph = None
+            topology = None
+    if graph is None:
+        graph = scanDot(fileName, nodeField=field)
+    if graph is not None:
+        if topology is None:
+            topology = buildTopology(graph)
+            if cache is not None:
+                cache['topology'] = topology
+        #A single gather for all the nodes
+        return ragged.RaggedArray(graph.values[topology.neighbours], topology.offsets)
     Gtmp = pgv.AGraph(fileName)
     tmp = [None] * Gtmp.number_of_nodes()
     for v in Gtmp.nodes_iter():
@@ -268,5 +477,5 @@ def readGraphFieldSpatial(fileName, field):
             index = index + 1
         tmp[int(v[1:])] = pop
     Gtmp.close()
-    return tmp
+    return ragged.fromLists(tmp)
     
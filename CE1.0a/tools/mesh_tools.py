@@ -7,6 +7,11 @@ import h5py
 import numpy as np
 import os, os.path
 import ConfigParser
+import threading
+from collections import namedtuple, OrderedDict
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+import ragged
 import utils as u
 
 def isMesh(parameters, variable):
@@ -62,7 +67,7 @@ def readMeshData(parameters, variable):
                         print fName
                         var = readField (fName, field)
                         if initial:
-                            aux_init_data = np.ndarray(shape=(var.size, round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                            aux_init_data = np.ndarray(shape=(var.size, int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                             initial = False
                         aux_init_data[:, i] = var
                         i = i + 1
@@ -83,16 +88,11 @@ def readMeshData(parameters, variable):
                     time_step = 1
                     if parameters.has_option(variable, 'time_step'):
                         time_step = eval(parameters.get(variable, 'time_step'))
-                    initial = True
-                    i = 0
+                    steps = []
                     for index in np.arange(time_from, time_to + time_step, time_step):
                         fName = fileName.replace('[T]', str(index))
-                        tmp = readSpatialData(fName, field, parameters, variable)
-                        if initial:
-                            aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                            initial = False
-                        aux_init_data[i, :] = tmp[:]
-                        i = i + 1
+                        steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps)
                 except ValueError as e:
                     print 'ERROR: ', e
                     
@@ -122,7 +122,7 @@ def readMeshData(parameters, variable):
                             fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time))
                             var = readField (fName, field)
                             if initial:
-                                aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), var.size, round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                aux_init_data = np.ndarray(shape=(int(round((time_to - time_from)/time_step + 1)), var.size, int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                 initial = False
                             aux_init_data[i, :, j] = np.resize(var, var.size)
                             j = j + 1
@@ -150,19 +150,14 @@ def readMeshData(parameters, variable):
                     time_step = 1
                     if parameters.has_option(variable, 'time_step'):
                         time_step = eval(parameters.get(variable, 'time_step'))
-                    initial = True
-                    i = 0
-                    for index_group in np.arange(group_from, group_to + group_step, group_step):
-                        j = 0
-                        for index_time in np.arange(time_from, time_to + time_step, time_step):
+                    groups = np.arange(group_from, group_to + group_step, group_step)
+                    times = np.arange(time_from, time_to + time_step, time_step)
+                    steps = []
+                    for index_group in groups:
+                        for index_time in times:
                             fName = fileName.replace('[T]', str(index_time)).replace('[G]', str(index_group))
-                            tmp = readSpatialData(fName, field, parameters, variable)
-                            if initial:
-                                aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                                initial = False
-                            aux_init_data[i, j, :] = tmp[:]
-                            j = j + 1
-                        i = i + 1
+                            steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps, (len(groups), len(times)))
                 except ValueError as e:
                     print 'ERROR: ', e
 
@@ -198,7 +193,7 @@ def readMeshData(parameters, variable):
                                 fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time)).replace('[G]', str(index_group))
                                 var = readField (fName, field)
                                 if initial:
-                                    aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), var.size, round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                    aux_init_data = np.ndarray(shape=(int(round((group_to - group_from)/group_step + 1)), int(round((time_to - time_from)/time_step + 1)), var.size, int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                     initial = False
                                 aux_init_data[i, j, :, k] = np.resize(var, var.size)
                                 k = k + 1
@@ -215,10 +210,26 @@ def readMeshData(parameters, variable):
     except Exception as e:
         print 'ERROR: ', e
 
+def stencilWindows(var, stencil, periodical):
+    '''
+    Gets the neighbourhood of every cell: the cells at most stencil cells away in every axis.
+    The windows are a strided view of the padded field. They are copied when they become a population.
+
+    Input:
+        var         field of each cell
+        stencil     neighbourhood distance
+        periodical  true if the mesh wraps around its boundaries
+    Returns:
+                    view with the shape of the field followed by the window axes,
+                    and the mask of the window cells inside the mesh, None if periodical
+    '''
+    return u.paddedWindows(var, stencil, 2 * stencil + 1, periodical)
+
 def readSpatialData(fileName, field, parameters, variable):
     '''
     Reads a field from the file spatially.
-    The neighbours field values of a cell N are stored in a list.
+    The neighbours field values of every cell are kept in a ragged population,
+    with the cells in C order and the neighbours of each cell in C order of the window.
 
     Input:
         fileName    data file name
@@ -226,90 +237,115 @@ def readSpatialData(fileName, field, parameters, variable):
         parameters  configParser parameters
         variable    CE variable to read
     Returns:
-                    list of values of every cell
+                    RaggedArray with the neighbour values of every cell
     '''
     periodical = parameters.getboolean(variable, 'periodical')
     stencil = parameters.getint(variable, 'stencil')
     var = readFieldForSpatial (fileName, field)
-    aux_init_data = []
-    for (i, j, k), val in np.ndenumerate(var):
-        i_min = i - stencil
-        i_max = i + stencil + 1
-        j_min = j - stencil
-        j_max = j + stencil + 1
-        k_min = k - stencil
-        k_max = k + stencil + 1
-        if not periodical:
-            i_min = max(i_min, 0)
-            i_max = min(i_max, var.shape[0])
-            j_min = max(j_min, 0)
-            j_max = min(j_max, var.shape[1])
-            k_min = max(k_min, 0)
-            k_max = min(k_max, var.shape[2])
-        pop = np.empty(((i_max-i_min) * (j_max-j_min) * (k_max-k_min)))
-        index = 0
-        for ni in xrange(i_min,i_max):
-            for nj in xrange(j_min,j_max):
-                for nk in xrange(k_min,k_max):
-                    if periodical:
-                        ni = ni % var.shape[0]
-                        nj = nj % var.shape[1]
-                        nk = nk % var.shape[2]
-                    pop[index] = var[ni, nj, nk]
-                    index = index + 1
-        aux_init_data.append(np.array(pop))
-    return aux_init_data
+    windows, mask = stencilWindows(var, stencil, periodical)
+    return u.windowPopulation(windows, mask)
 
-def readField (folder, field):
+#Mesh layout of a SAMRAI output directory, parsed from its summary.samrai
+MeshSummary = namedtuple('MeshSummary', ['stamp', 'size', 'lower', 'upper', 'processors'])
+
+#Summaries of the last directories read, least recently used first: (directory, modification time, size) -> MeshSummary
+SUMMARY_CACHE_SIZE = 64
+summaries = OrderedDict()
+summariesLock = threading.Lock()
+
+def readSummary(folder):
     '''
-    Reads a field from the file.
+    Reads the patch layout of a SAMRAI output directory.
+    The layout of the last SUMMARY_CACHE_SIZE directories is cached, so reading other fields
+    or reading the directory again does not parse the summary again while it does not change.
 
     Input:
         folder      data folder name
-        field       field to read
     Returns:
-                    the field of each cell
+                    MeshSummary: size of the mesh, lower and upper corners of every patch relative to the mesh,
+                    and processor file of every patch
     '''
-    #Read mesh information
-    f_sum = h5py.File(folder + '/summary.samrai', "r")
-    nProcessors  = f_sum['/BASIC_INFO/number_processors']
-    nPatches     = f_sum['/BASIC_INFO/number_patches_at_level']
-    patchExtents = f_sum['/extents/patch_extents']
-    patchMap     = f_sum['/extents/patch_map']
-    varNames = f_sum['/BASIC_INFO/var_names']
-    
-    maximum = [0, 0, 0]
-    minimum = [999999, 999999, 999999]
-    for i in xrange(len(patchExtents)):
-        maximum[0] = max(maximum[0], patchExtents[i][1][0])
-        maximum[1] = max(maximum[1], patchExtents[i][1][1])
-        maximum[2] = max(maximum[2], patchExtents[i][1][2])
-        minimum[0] = min(minimum[0], patchExtents[i][0][0])
-        minimum[1] = min(minimum[1], patchExtents[i][0][1])
-        minimum[2] = min(minimum[2], patchExtents[i][0][2])
-    size = [(maximum[0] - minimum[0]) + 1 ,(maximum[1] - minimum[1]) + 1 ,(maximum[2] - minimum[2]) + 1]
+    fileName = os.path.join(folder, 'summary.samrai')
+    info = os.stat(fileName)
+    stamp = (info.st_mtime, info.st_size)
+    key = (os.path.abspath(folder),) + stamp
+    with summariesLock:
+        summary = summaries.pop(key, None)
+        if summary is not None:
+            summaries[key] = summary
+            return summary
+    f_sum = h5py.File(fileName, "r")
+    nPatches = f_sum['/BASIC_INFO/number_patches_at_level'][0]
+    patchExtents = f_sum['/extents/patch_extents'][:nPatches]
+    patchMap = f_sum['/extents/patch_map'][:nPatches]
+    f_sum.close()
+    lower = np.asarray(patchExtents[patchExtents.dtype.names[0]], dtype='int64').reshape((nPatches, 3))
+    upper = np.asarray(patchExtents[patchExtents.dtype.names[1]], dtype='int64').reshape((nPatches, 3))
+    minimum = lower.min(axis=0)
+    summary = MeshSummary(stamp, tuple(upper.max(axis=0) - minimum + 1), lower - minimum, upper - minimum, np.asarray(patchMap[patchMap.dtype.names[0]]))
+    with summariesLock:
+        summaries[key] = summary
+        while len(summaries) > SUMMARY_CACHE_SIZE:
+            summaries.popitem(last=False)
+    return summary
 
-    data = np.zeros(shape=(size[0]*size[1]*size[2]))
+def readProcessorFile(folder, field, summary, data, iProc):
+    '''
+    Reads the patches of a processor file into the mesh.
+    The patches are stored in Fortran order, the C order of the transposed mesh, so each one is read
+    by HDF5 directly into its block of data, without intermediate copies.
 
-    for iPatch in xrange(nPatches[0]):
-        iProc = patchMap[iPatch][0]
-        iProcStr = str(iProc).zfill(5)
-        iPatchStr = str(iPatch).zfill(5)
-        rangeX = (patchExtents[iPatch][0][0], patchExtents[iPatch][1][0]+1)
-        rangeY = (patchExtents[iPatch][0][1], patchExtents[iPatch][1][1]+1)
-        rangeZ = (patchExtents[iPatch][0][2], patchExtents[iPatch][1][2]+1)
-        sizeX = patchExtents[iPatch][1][0] - patchExtents[iPatch][0][0] + 1;
-        sizeY = patchExtents[iPatch][1][1] - patchExtents[iPatch][0][1] + 1;
-        sizeZ = patchExtents[iPatch][1][2] - patchExtents[iPatch][0][2] + 1;
-        f_data = h5py.File(folder + '/processor_cluster.' + iProcStr + '.samrai', "r")
-        tmp = f_data['/processor.' + iProcStr + '/level.00000/patch.' + iPatchStr + '/' + field]
-        data[:] = tmp[:]
+    Input:
+        folder      data folder name
+        field       field to read
+        summary     MeshSummary
+        data        C ordered ZxYxX array of the transposed mesh
+        iProc       processor number
+    '''
+    iProcStr = str(iProc).zfill(5)
+    f_data = h5py.File(folder + '/processor_cluster.' + iProcStr + '.samrai', "r")
+    try:
+        for iPatch in np.flatnonzero(summary.processors == iProc):
+            lower = summary.lower[iPatch]
+            upper = summary.upper[iPatch] + 1
+            tmp = f_data['/processor.' + iProcStr + '/level.00000/patch.' + str(iPatch).zfill(5) + '/' + field]
+            #The flat patch fills its block of data in order, so it is read straight into a hyperslab of data
+            memorySpace = h5py.h5s.create_simple(data.shape)
+            memorySpace.select_hyperslab(tuple(lower[::-1]), tuple(upper[::-1] - lower[::-1]))
+            tmp.id.read(memorySpace, tmp.id.get_space(), data)
+    finally:
         f_data.close()
-    f_sum.close()
 
+def readMesh(folder, field, threads=None):
+    '''
+    Reads a field of every cell, opening each processor file once.
+    The processor files are read concurrently.
+
+    Input:
+        folder      data folder name
+        field       field to read
+        threads     number of reading threads, by default one per processor file up to the number of CPUs
+    Returns:
+                    C ordered ZxYxX array of the transposed mesh
+    '''
+    summary = readSummary(folder)
+    data = np.zeros(summary.size[::-1])
+    processors = np.unique(summary.processors)
+    if threads is None:
+        threads = min(len(processors), cpu_count())
+    if threads <= 1 or len(processors) <= 1:
+        for iProc in processors:
+            readProcessorFile(folder, field, summary, data, iProc)
+        return data
+    pool = ThreadPool(processes=threads)
+    try:
+        pool.map(lambda iProc: readProcessorFile(folder, field, summary, data, iProc), processors)
+    finally:
+        pool.close()
+        pool.join()
     return data
 
-def readFieldForSpatial (folder, field):
+def readField (folder, field):
     '''
     Reads a field from the file.
 
@@ -317,44 +353,19 @@ def readFieldForSpatial (folder, field):
         folder      data folder name
         field       field to read
     Returns:
-                    the field of each cell
+                    the field of each cell, in Fortran order of the mesh
     '''
-    #Read mesh information
-    f_sum = h5py.File(folder + '/summary.samrai', "r")
-    nProcessors  = f_sum['/BASIC_INFO/number_processors']
-    nPatches     = f_sum['/BASIC_INFO/number_patches_at_level']
-    patchExtents = f_sum['/extents/patch_extents']
-    patchMap     = f_sum['/extents/patch_map']
-    varNames = f_sum['/BASIC_INFO/var_names']
-    
-    maximum = [0, 0, 0]
-    minimum = [999999, 999999, 999999]
-    for i in xrange(len(patchExtents)):
-        maximum[0] = max(maximum[0], patchExtents[i][1][0])
-        maximum[1] = max(maximum[1], patchExtents[i][1][1])
-        maximum[2] = max(maximum[2], patchExtents[i][1][2])
-        minimum[0] = min(minimum[0], patchExtents[i][0][0])
-        minimum[1] = min(minimum[1], patchExtents[i][0][1])
-        minimum[2] = min(minimum[2], patchExtents[i][0][2])
-    size = [(maximum[0] - minimum[0]) + 1 ,(maximum[1] - minimum[1]) + 1 ,(maximum[2] - minimum[2]) + 1]
+    #Fortran order of the mesh is the C order of the transposed mesh, so it is not copied
+    return readMesh(folder, field).ravel()
 
-    data = np.zeros(shape=(size[0], size[1], size[2]))
-
-    for iPatch in xrange(nPatches[0]):
-        iProc = patchMap[iPatch][0]
-        iProcStr = str(iProc).zfill(5)
-        iPatchStr = str(iPatch).zfill(5)
-        rangeX = (patchExtents[iPatch][0][0], patchExtents[iPatch][1][0]+1)
-        rangeY = (patchExtents[iPatch][0][1], patchExtents[iPatch][1][1]+1)
-        rangeZ = (patchExtents[iPatch][0][2], patchExtents[iPatch][1][2]+1)
-        sizeX = patchExtents[iPatch][1][0] - patchExtents[iPatch][0][0] + 1;
-        sizeY = patchExtents[iPatch][1][1] - patchExtents[iPatch][0][1] + 1;
-        sizeZ = patchExtents[iPatch][1][2] - patchExtents[iPatch][0][2] + 1;
-        f_data = h5py.File(folder + '/processor_cluster.' + iProcStr + '.samrai', "r")
-        tmp = f_data['/processor.' + iProcStr + '/level.00000/patch.' + iPatchStr + '/' + field]
-        tmp = np.reshape(tmp, (sizeX,sizeY,sizeZ), order="F")
-        data[rangeX[0]:rangeX[1],rangeY[0]:rangeY[1],rangeZ[0]:rangeZ[1]] = tmp[:,:,:]
-        f_data.close()
-    f_sum.close()
+def readFieldForSpatial (folder, field):
+    '''
+    Reads a field from the file.
 
-    return data
+    Input:
+        folder      data folder name
+        field       field to read
+    Returns:
+                    the field of each cell, XxYxZ
+    '''
+    return readMesh(folder, field).T
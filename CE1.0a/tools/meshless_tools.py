@@ -7,10 +7,16 @@ import Silo
 import numpy as np
 import os, os.path
 import ConfigParser
-import math
-import itertools
+import ragged
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from scipy.spatial import cKDTree
 import utils as u
 
+#Particles sorted by the cell of a regular mesh holding them. The particles of flat cell c, in C order of shape,
+#are particles[offsets[c]:offsets[c + 1]]. Positions are NxD, in the order of readField
+CellList = namedtuple('CellList', ['shape', 'offsets', 'particles', 'positions', 'lower', 'upper'])
+
 def isMeshless(parameters, variable):
     '''
     Checks the format.
@@ -27,6 +33,21 @@ def isMeshless(parameters, variable):
     except:
         return False
 
+def readerThreads(parameters, variable):
+    '''
+    Gets the number of processor files read at the same time, the "reader_threads" option.
+    The Silo library is not thread safe in general, so files are read one by one by default.
+
+    Input:
+        parameters  configParser parameters
+        variable    CE variable to read
+    Returns:
+                    number of threads
+    '''
+    if parameters.has_option(variable, 'reader_threads'):
+        return max(parameters.getint(variable, 'reader_threads'), 1)
+    return 1
+
 def readMeshlessData(parameters, variable):
     '''
     Reads the variable.
@@ -42,12 +63,13 @@ def readMeshlessData(parameters, variable):
         field = parameters.get(variable, 'field')
         popType = parameters.get(variable, 'population_type')
         dims = parameters.getint(variable, 'dimensions')
+        threads = readerThreads(parameters, variable)
         assert 2 <= dims <= 4, 'ERROR: Number of dimensions ' + dims + ' for variable ' + variable + ' is incorrect. It should be 2, 3, or 4.'
         assert popType == 'statistical' or popType == 'spatial', 'ERROR: Population type ' + popType + ' for variable ' + variable + ' incorrect.'
 
         if dims == 2:
             if popType == 'spatial':
-                return np.array(readSpatialData(fileName, field, parameters, variable))
+                return readSpatialData(fileName, field, parameters, variable)
             if popType == 'statistical':
                 assert fileName.count('[P]') == 1, 'ERROR: Statistical population for variable ' + variable + ' must have "[P]" wildcard.'
                 try:
@@ -60,9 +82,9 @@ def readMeshlessData(parameters, variable):
                     i = 0
                     for index_stat in np.arange(stat_from, stat_to + stat_step, stat_step):
                         fName = fileName.replace('[P]', str(index_stat))
-                        var = readField (fName, field)
+                        var = readField (fName, field, threads)
                         if initial:
-                            aux_init_data = np.ndarray(shape=(var.shape[0], round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                            aux_init_data = np.ndarray(shape=(var.shape[0], int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                             initial = False
                         aux_init_data[:, i] = np.resize(var, var.size)
                         i = i + 1
@@ -83,16 +105,11 @@ def readMeshlessData(parameters, variable):
                     time_step = 1
                     if parameters.has_option(variable, 'time_step'):
                         time_step = eval(parameters.get(variable, 'time_step'))
-                    initial = True
-                    i = 0
+                    steps = []
                     for index in np.arange(time_from, time_to + time_step, time_step):
                         fName = fileName.replace('[T]', str(index))
-                        tmp = readSpatialData(fName, field, parameters, variable)
-                        if initial:
-                            aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                            initial = False
-                        aux_init_data[i, :] = tmp[:]
-                        i = i + 1
+                        steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps)
                 except ValueError as e:
                     print 'ERROR: ', e
                     
@@ -120,9 +137,9 @@ def readMeshlessData(parameters, variable):
                         j = 0
                         for index_stat in np.arange(stat_from, stat_to + stat_step, stat_step):
                             fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time))
-                            var = readField (fName, field)
+                            var = readField (fName, field, threads)
                             if initial:
-                                aux_init_data = np.ndarray(shape=(round((time_to - time_from)/time_step + 1), var.shape[0], round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                aux_init_data = np.ndarray(shape=(int(round((time_to - time_from)/time_step + 1)), var.shape[0], int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                 initial = False
                             aux_init_data[i, :, j] = np.resize(var, var.size)
                             j = j + 1
@@ -150,19 +167,14 @@ def readMeshlessData(parameters, variable):
                     time_step = 1
                     if parameters.has_option(variable, 'time_step'):
                         time_step = eval(parameters.get(variable, 'time_step'))
-                    initial = True
-                    i = 0
-                    for index_group in np.arange(group_from, group_to + group_step, group_step):
-                        j = 0
-                        for index_time in np.arange(time_from, time_to + time_step, time_step):
+                    groups = np.arange(group_from, group_to + group_step, group_step)
+                    times = np.arange(time_from, time_to + time_step, time_step)
+                    steps = []
+                    for index_group in groups:
+                        for index_time in times:
                             fName = fileName.replace('[T]', str(index_time)).replace('[G]', str(index_group))
-                            tmp = readSpatialData(fName, field, parameters, variable)
-                            if initial:
-                                aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), len(tmp)), dtype=object)
-                                initial = False
-                            aux_init_data[i, j, :] = tmp[:]
-                            j = j + 1
-                        i = i + 1
+                            steps.append(readSpatialData(fName, field, parameters, variable))
+                    aux_init_data = ragged.stack(steps, (len(groups), len(times)))
                 except ValueError as e:
                     print 'ERROR: ', e
                     
@@ -198,9 +210,9 @@ def readMeshlessData(parameters, variable):
                             k = 0
                             for index_stat in np.arange(stat_from, stat_to + stat_step, stat_step):
                                 fName = fileName.replace('[P]', str(index_stat)).replace('[T]', str(index_time)).replace('[G]', str(index_group))
-                                var = readField (fName, field)
+                                var = readField (fName, field, threads)
                                 if initial:
-                                    aux_init_data = np.ndarray(shape=(round((group_to - group_from)/group_step + 1), round((time_to - time_from)/time_step + 1), var.shape[0], round((stat_to - stat_from)/stat_step + 1)), dtype='float')
+                                    aux_init_data = np.ndarray(shape=(int(round((group_to - group_from)/group_step + 1)), int(round((time_to - time_from)/time_step + 1)), var.shape[0], int(round((stat_to - stat_from)/stat_step + 1))), dtype='float')
                                     initial = False
                                 aux_init_data[i, j, :, k] = np.resize(var, var.size)
                                 k = k + 1
@@ -221,7 +233,9 @@ def readMeshlessData(parameters, variable):
 def readSpatialData(fileName, field, parameters, variable):
     '''
     Reads a field from the file spatially.
-    The neighbours field values of a particle N are stored in a list.
+    The neighbours field values of every particle are kept in a ragged population.
+    The neighbours are the other particles within the radius, found at once for all the particles with a KD-tree.
+    The particles are ordered by the cell of radius length holding them.
 
     Input:
         fileName    data file name
@@ -229,93 +243,111 @@ def readSpatialData(fileName, field, parameters, variable):
         parameters  configParser parameters
         variable    CE variable to read
     Returns:
-                    list of values of every particle
+                    RaggedArray with the neighbour values of every particle
     '''
     periodical = parameters.getboolean(variable, 'periodical')
     radius = parameters.getfloat(variable, 'radius')
-    radius2 = radius*radius
-    aux_init_data = []
-    var = readField (fileName, field)
-    coords = particlesToMesh(fileName, field, radius)
-    ndims = len(coords) - 1
-    domainSize = coords[0].shape
-    index = 0
-    for i_cell, val in np.ndenumerate(coords[0]):
-        particles = coords[ndims][i_cell]
-        for i_part in xrange(len(particles)):
-            pop = []
-            xa = coords[0][i_cell][i_part]
-            if ndims >= 2:
-                ya = coords[1][i_cell][i_part]
-                if ndims == 3:
-                    za = coords[2][i_cell][i_part]
-            iterator = itertools.product(xrange(-1,2), repeat=ndims)
-            for addend in iterator:
-                ni_cell = tuple((a + b) % c for a, b, c in zip(i_cell, addend, domainSize))
-                nparticles = coords[ndims][ni_cell]
-                if len(nparticles) > 0:
-                    npparticles = np.array(nparticles)
-                    indices = np.where(npparticles != particles[i_part])
-                    lisx = np.array(coords[0][ni_cell])
-                    xb = lisx[indices[0]]
-                    dist = xb-xa
-                    indices2 = np.where(dist < 0)
-                    dist[indices2[0]] = -dist[indices2[0]]
-                    #periodic considerations. Allways pick the nearest distance
-                    if periodical:
-                        indices2a = np.where(dist > domainSize[0] * 0.5)
-                        dist[indices2a[0]] = domainSize[0] - dist[indices2a[0]]
-                    dist = dist * dist
-                    if ndims >= 2:
-                        lisy = np.array(coords[1][ni_cell])
-                        yb = lisy[indices[0]]
-                        dy = yb-ya
-                        indices3 = np.where(dy < 0)
-                        dy[indices3[0]] = -dy[indices3[0]]
-                        #periodic considerations. Allways pick the nearest distance
-                        if periodical:
-                            indices3a = np.where(dy > domainSize[1] * 0.5)
-                            dy[indices3a[0]] = domainSize[1] - dy[indices3a[0]]
-                        dist = dist + dy * dy
-                        if ndims == 3:
-                            lisz = np.array(coords[2][ni_cell])
-                            zb = lisz[indices[0]]
-                            dz = zb-za
-                            indices4 = np.where(dz < 0)
-                            dz[indices4[0]] = -dz[indices4[0]]
-                            #periodic considerations. Allways pick the nearest distance
-                            if periodical:
-                                indices4a = np.where(dz > domainSize[2] * 0.5)
-                                dz[indices4a[0]] = domainSize[2] - dz[indices4a[0]]
-                            dist = dist + dz * dz
-                    indices5 = np.where(dist <= radius2)
-                    pop.extend(var[npparticles[indices[0]][indices5[0]]])
-            index = index + 1
-            aux_init_data.append(np.array(pop))
-    return aux_init_data
-
-def readField (folder, field):
+    var, positions, minimum, maximum = readParticles(fileName, field, True, readerThreads(parameters, variable))
+    cells = cellList(positions, minimum, maximum, radius)
+    positions = positions - minimum
+    if periodical:
+        #Periodic distances in the domain box. Particles on the upper boundary are the ones on the lower one
+        boxSize = maximum - minimum
+        tree = cKDTree(np.mod(positions, boxSize), boxsize=boxSize)
+    else:
+        tree = cKDTree(positions)
+    pairs = tree.query_pairs(radius, output_type='ndarray')
+    #Every pair gives a neighbour to both particles. A particle is never paired with itself
+    particles = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    neighbours = np.concatenate((pairs[:, 1], pairs[:, 0]))
+
+    rank = np.empty(len(var), dtype='int64')
+    rank[cells.particles] = np.arange(len(var))
+    element = rank[particles]
+    sort = np.lexsort((neighbours, element))
+    offsets = np.zeros(len(var) + 1, dtype='int64')
+    offsets[1:] = np.cumsum(np.bincount(element, minlength=len(var)))
+    return ragged.RaggedArray(var[neighbours[sort]], offsets)
+
+def readField (folder, field, threads=1):
     '''
     Reads a field from the file.
 
     Input:
         folder      data folder name
         field       field to read
+        threads     number of processor files read at the same time
     Returns:
                     the field of each particle
     '''
-    first = True
-    for file in sorted(listOfFiles(folder)):
-        db = Silo.Open(folder + "/" + file)
+    return readParticles(folder, field, False, threads)[0]
+
+def readParticles(folder, field, coordinates=True, threads=1):
+    '''
+    Reads a field and the particle positions in a single pass over the processor files.
+    The files are read into their own arrays, concurrently if requested, and joined into arrays
+    allocated once for all the particles.
+
+    Input:
+        folder      data folder name
+        field       field to read
+        coordinates true to read the positions
+        threads     number of processor files read at the same time
+    Returns:
+                    field of each particle, positions NxD in the same order, lower and upper extents of the domain.
+                    The last three are None when the coordinates are not read
+    '''
+    files = sorted(listOfFiles(folder))
+    read = lambda file: readProcessorFile(folder, file, field, coordinates)
+    if threads > 1 and len(files) > 1:
+        pool = ThreadPool(processes=min(threads, len(files)))
+        try:
+            pieces = pool.map(read, files)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        pieces = [read(file) for file in files]
+
+    offsets = np.zeros(len(pieces) + 1, dtype='int64')
+    offsets[1:] = np.cumsum([len(piece[0]) for piece in pieces])
+    data = np.empty(offsets[-1], dtype=pieces[0][0].dtype)
+    for piece, start, end in zip(pieces, offsets[:-1], offsets[1:]):
+        data[start:end] = piece[0]
+    if not coordinates:
+        return data, None, None, None
+    positions = np.empty((offsets[-1], len(pieces[0][2])), dtype='float')
+    for piece, start, end in zip(pieces, offsets[:-1], offsets[1:]):
+        positions[start:end] = piece[1]
+    minimum = np.min([piece[2] for piece in pieces], axis=0)
+    maximum = np.max([piece[3] for piece in pieces], axis=0)
+    return data, positions, minimum, maximum
+
+def readProcessorFile(folder, file, field, coordinates):
+    '''
+    Reads the particles of a processor file.
+
+    Input:
+        folder      data folder name
+        file        processor file name
+        field       field to read
+        coordinates true to read the positions
+    Returns:
+                    field of each particle, positions NxD, lower and upper extents of the file.
+                    The last three are None when the coordinates are not read
+    '''
+    db = Silo.Open(folder + "/" + file)
+    try:
         db.SetDir("level_00000/patch_" + file[file.find('.') + 1:file.rfind('.')])
-        if first:
-                   data = np.array(db.GetVar(field + "__data"))
-        else:
-                   data = np.append(data, np.array(db.GetVar(field + "__data")))
+        data = np.array(db.GetVar(field + "__data"))
+        if not coordinates:
+            return data, None, None, None
+        min_extents = np.array(db.GetVar(field + "PointMesh_min_extents"))
+        max_extents = np.array(db.GetVar(field + "PointMesh_max_extents"))
+        positions = np.column_stack([np.array(db.GetVar(field + "PointMesh_coord" + str(i))) for i in xrange(len(min_extents))])
+        return data, positions, min_extents, max_extents
+    finally:
         db.Close()
-        first = False
-
-    return data
 
 def particlesToMesh(folder, field, radius):
     '''
@@ -326,93 +358,46 @@ def particlesToMesh(folder, field, radius):
         field       field to read
         radius      lenght of the cells
     Returns:
-                    the mesh position and particles in each cell
+                    CellList with the particles of every cell
     '''
-    # Join multiprocessor information
-    first = True
-    ndims = 1
-    for file in sorted(listOfFiles(folder)):
-        db = Silo.Open(folder + "/" + file)
-        db.SetDir("level_00000/patch_" + file[file.find('.') + 1:file.rfind('.')])
-        if first:
-            min_extents = np.array(db.GetVar(field + "PointMesh_min_extents"))
-            max_extents = np.array(db.GetVar(field + "PointMesh_max_extents"))
-            ndims = len(min_extents)
-            x_var = np.array(db.GetVar(field + "PointMesh_coord0"))
-        else:
-            min_extents = np.minimum(min_extents, np.array(db.GetVar(field + "PointMesh_min_extents")))
-            max_extents = np.maximum(max_extents, np.array(db.GetVar(field + "PointMesh_max_extents")))
-            x_var = np.append(x_var, np.array(db.GetVar(field + "PointMesh_coord0")))
-        if ndims >= 2:
-            if first:
-                y_var = np.array(db.GetVar(field + "PointMesh_coord1"))
-            else:
-                y_var = np.append(y_var, np.array(db.GetVar(field + "PointMesh_coord1")))
-        if ndims == 3:
-            if first:
-                z_var = np.array(db.GetVar(field + "PointMesh_coord2"))
-            else:
-                z_var = np.append(z_var, np.array(db.GetVar(field + "PointMesh_coord2")))
-        first = False
-        db.Close()
+    data, positions, minimum, maximum = readParticles(folder, field)
+    return cellList(positions, minimum, maximum, radius)
+
+def cellList(positions, minimum, maximum, radius):
+    '''
+    Sorts the particles by the cell of a regular mesh holding them.
+
+    Input:
+        positions   particle positions NxD
+        minimum     lower extent of the domain
+        maximum     upper extent of the domain
+        radius      lenght of the cells
+    Returns:
+                    CellList with the particles of every cell
+    '''
+    numberOfCells, cells = cellIndex(positions - minimum, maximum - minimum, radius)
+    particles = np.argsort(cells, kind='mergesort')
+    offsets = np.zeros(np.prod(numberOfCells) + 1, dtype='int64')
+    offsets[1:] = np.cumsum(np.bincount(cells, minlength=np.prod(numberOfCells)))
+    return CellList(tuple(numberOfCells), offsets, particles, positions, minimum, maximum)
 
-    numberOfCells = np.ndarray(shape=(ndims), dtype=int)
-    for i in xrange(ndims):
-        numberOfCells[i] = math.ceil((max_extents[i] - min_extents[i])/radius)
-
-    particleId = np.ndarray(shape=(numberOfCells), dtype=object)
-    x = np.ndarray(shape=(numberOfCells), dtype=object)
-    deltax = (max_extents[0] - min_extents[0])/numberOfCells[0]
-    if ndims >= 2:
-        y = np.ndarray(shape=(numberOfCells), dtype=object)
-        deltay = (max_extents[1] - min_extents[1])/numberOfCells[1]
-    if ndims == 3:
-        z = np.ndarray(shape=(numberOfCells), dtype=object)
-        deltaz = (max_extents[2] - min_extents[2])/numberOfCells[2]
-    for index, value in np.ndenumerate(x):
-        x[index] = list()
-        if ndims >= 2:
-            y[index] = list()
-        if ndims == 3:
-            z[index] = list()
-        particleId[index] = list()
-
-    #Particle to mesh
-    for i in xrange(0,len(x_var)):
-        posx = x_var[i]
-        mi = int(x_var[i]/deltax)
-        if mi == numberOfCells[0]:
-            mi = mi-1
-        if ndims >= 2:
-            posy = y_var[i]
-            mj = int(y_var[i]/deltay)
-            if mj == numberOfCells[1]:
-                mj = mj-1
-        if ndims == 3:
-            posz = z_var[i]
-            mk = int(z_var[i]/deltaz)
-            if mk == numberOfCells[2]:
-                mk = mk-1
-        if ndims == 1:            
-            x[mi].append(posx)
-            particleId[mi].append(i)
-        if ndims == 2:            
-            x[mi, mj].append(posx)
-            y[mi, mj].append(posy)
-            particleId[mi, mj].append(i)
-        if ndims == 3:            
-            x[mi, mj, mk].append(posx)
-            y[mi, mj, mk].append(posy)
-            z[mi, mj, mk].append(posz)
-            particleId[mi, mj, mk].append(i)
-
-    if ndims == 1:            
-        return x, particleId
-    if ndims == 2:    
-        return x, y, particleId
-    if ndims == 3:    
-        return x, y, z, particleId
+def cellIndex(positions, size, radius):
+    '''
+    Gets the cell of a regular mesh of radius length holding every particle.
 
+    Input:
+        positions   particle positions NxD, relative to the lower extent of the domain
+        size        size of the domain
+        radius      lenght of the cells
+    Returns:
+                    number of cells in every dimension, flat cell index in C order of every particle
+    '''
+    numberOfCells = np.maximum(np.ceil(size / radius).astype('int64'), 1)
+    delta = size / numberOfCells
+    #Particles on the upper boundary belong to the last cell
+    cells = np.floor_divide(positions, np.where(delta > 0, delta, 1)).astype('int64')
+    cells = np.clip(cells, 0, numberOfCells - 1)
+    return numberOfCells, np.ravel_multi_index(tuple(cells.T), tuple(numberOfCells))
 
 def listOfFiles(directory):
     '''
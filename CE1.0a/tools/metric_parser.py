@@ -0,0 +1,295 @@
+'''
+Metric expression parser.
+Compiles each expression of the Metrics section once into an argument plan.
+Evaluating a plan only reads and indexes the variables, without parsing or eval().
+'''
+
+import re
+from collections import namedtuple
+
+#Compiled metric expression. Field expressions have no metric name and a single variable argument
+MetricPlan = namedtuple('MetricPlan', ['expression', 'name', 'arguments'])
+#Compiled parameter. Constants keep their value, variables their name, whether they are temporal ({variable}) and the indices applied after the time index
+Argument = namedtuple('Argument', ['kind', 'value', 'temporal', 'index'])
+
+def getTyped(s):
+    '''
+    Gets the type of the variable
+
+    Input:
+        s       variable
+    Returns:
+                type
+    '''
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+def isNum(s):
+    '''
+    Checks if the variable is a number
+
+    Input:
+        s       variable
+    Returns:
+                true if number
+    '''
+    try:
+        int(s)
+        return True
+    except ValueError:
+        try:
+            float(s)
+            return True
+        except ValueError:
+            return False
+
+def isString(s):
+    '''
+    Checks if the variable is a string
+
+    Input:
+        s       variable
+    Returns:
+                true if string
+    '''
+    if re.match(r'"[^"]+"', s) != None:
+        return True
+    return False
+
+def isList (s):
+    '''
+    Checks if the variable is a list: numbers separated by spaces
+
+    Input:
+        s       variable
+    Returns:
+                true if list
+    '''
+    lista = s.split()
+    return len(lista) > 1 and all(isNum(elem) for elem in lista)
+
+def createList(s):
+    '''
+    Creates a list from the values of a variable
+
+    Input:
+        s       variable
+    Returns:
+                list
+    '''
+    listRange = []
+    for elem in s.split():
+        listRange.append(getTyped(elem))
+    return listRange
+
+def splitTopLevel(s, separator):
+    '''
+    Splits a string by a separator not enclosed in brackets, braces or quotes.
+
+    Input:
+        s           string to split
+        separator   separator character
+    Returns:
+                    list of substrings
+    '''
+    parts = []
+    depth = 0
+    quoted = False
+    last = 0
+    for i, c in enumerate(s):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c in '[{(':
+            depth = depth + 1
+        elif c in ']})':
+            depth = depth - 1
+        elif c == separator and depth == 0:
+            parts.append(s[last:i])
+            last = i + 1
+    parts.append(s[last:])
+    return parts
+
+def parseIndexItem(item):
+    '''
+    Parses one item of an index: integer, slice, list of integers, "..." or None.
+
+    Input:
+        item    index item text
+    Returns:
+                the index object
+    '''
+    item = item.strip()
+    if item == '...':
+        return Ellipsis
+    if item == 'None':
+        return None
+    if item.startswith('[') and item.endswith(']'):
+        return [int(i) for i in splitTopLevel(item[1:-1], ',')]
+    if item.count(':'):
+        bounds = item.split(':')
+        if len(bounds) > 3:
+            raise ValueError(item)
+        return slice(*[int(b) if b.strip() != '' else None for b in bounds])
+    return int(item)
+
+def parseIndex(s):
+    '''
+    Parses the brackets following a variable name. Consecutive brackets are applied one after the other.
+
+    Input:
+        s       index text, as "[0:10, 2][1]"
+    Returns:
+                list of index tuples
+    '''
+    index = []
+    while s != '':
+        if not s.startswith('['):
+            raise ValueError(s)
+        #Closing bracket of the first group
+        depth = 0
+        for end, c in enumerate(s):
+            if c == '[':
+                depth = depth + 1
+            elif c == ']':
+                depth = depth - 1
+                if depth == 0:
+                    break
+        if depth != 0:
+            raise ValueError(s)
+        index.append(tuple(parseIndexItem(item) for item in splitTopLevel(s[1:end], ',')))
+        s = s[end + 1:].strip()
+    return index
+
+def compileParameter(par):
+    '''
+    Compiles a metric parameter.
+    A temporal variable is {variable}, indexed as {variable[index]} or {variable}[index].
+    The index is applied after the time index.
+
+    Input:
+        par     parameter text
+    Returns:
+                Argument
+    '''
+    #numerical constant
+    if isNum(par):
+        return Argument('constant', getTyped(par), False, [])
+    #boolean constant
+    if par.lower() == 'true' or par.lower() == 'false':
+        return Argument('constant', par.lower() == 'true', False, [])
+    #String
+    if isString(par):
+        return Argument('constant', par[1:len(par)-1], False, [])
+    #numerical list
+    if isList(par):
+        return Argument('constant', createList(par), False, [])
+    #variable, temporal or not, with optional slice
+    temporal = par.startswith('{') and par.count('}') == 1
+    if temporal:
+        close = par.index('}')
+        par = (par[1:close] + par[close + 1:]).strip()
+    name = par
+    index = []
+    if par.count('['):
+        name = par[:par.index('[')].strip()
+        index = parseIndex(par[par.index('['):].strip())
+    if re.match(r'^[^\s\[\]{}(),"]+$', name) == None:
+        raise ValueError(par)
+    return Argument('variable', name, temporal, index)
+
+def compileMetric(expression):
+    '''
+    Compiles a metric expression into its argument plan.
+
+    Input:
+        expression  metric expression
+    Returns:
+                    MetricPlan
+    '''
+    expression = expression.strip()
+    arguments = []
+    par = expression
+    try:
+        #It is a metric
+        if expression.count('('):
+            name = expression[:expression.index('(')].strip()
+            metric_parameters = expression[expression.index('(') + 1:expression.rindex(')')]
+            if metric_parameters.strip() != '':
+                for par in splitTopLevel(metric_parameters, ','):
+                    par = par.strip()
+                    arguments.append(compileParameter(par))
+        #It is a field
+        else:
+            name = None
+            arguments.append(compileParameter(expression))
+    except ValueError:
+        print 'ERROR: Error in ', expression, ', parameter ' + par + ' is not correct.'
+        raise Exception()
+    return MetricPlan(expression, name, arguments)
+
+def references(plan):
+    '''
+    Gets the names of the variables referenced by a plan.
+
+    Input:
+        plan    MetricPlan
+    Returns:
+                list of variable names, in order of appearance
+    '''
+    names = []
+    for arg in plan.arguments:
+        if arg.kind == 'variable' and arg.value not in names:
+            names.append(arg.value)
+    return names
+
+def checkTemporal(plan, variables):
+    '''
+    Checks the temporal arguments of a plan against the variables.
+
+    Input:
+        plan        MetricPlan
+        variables   variable dictionary
+    Returns:
+                    number of time steps, None if the plan is not temporal
+    '''
+    steps = None
+    for arg in plan.arguments:
+        if arg.temporal:
+            if len(variables[arg.value].shape) != 3:
+                print 'ERROR: {Variables} must come from statistical_temporal variables or derivatives. Location: ', plan.expression, '. Variable: ', arg.value, '.'
+                raise Exception()
+            if steps is None:
+                steps = variables[arg.value].shape[0]
+    return steps
+
+def evaluateArguments(plan, variables, time=0):
+    '''
+    Gets the parameter values of a plan.
+
+    Input:
+        plan        MetricPlan
+        variables   variable dictionary
+        time        time index for the temporal arguments.
+                    None gives the whole time series of the non sliced temporal arguments
+    Returns:
+                    parameter values
+    '''
+    param_vals = []
+    for arg in plan.arguments:
+        if arg.kind == 'constant':
+            param_vals.append(arg.value)
+            continue
+        value = variables[arg.value]
+        if arg.temporal and time is not None:
+            value = value[time]
+        elif arg.temporal and len(arg.index) > 0:
+            print 'ERROR: Sliced {Variables} must be read one time step at a time. Location: ', plan.expression, '. Variable: ', arg.value, '.'
+            raise Exception()
+        for index in arg.index:
+            value = value[index]
+        param_vals.append(value)
+    return param_vals
@@ -0,0 +1,155 @@
+'''
+Execution profiler.
+Measures each input section read and each metric: wall and CPU time, peak memory growth, bytes read
+and files opened. Enabled with profile = true in [Config], the report is written next to the output file
+as JSON (<output>.profile.json) and as Chrome trace events (<output>.trace.json), viewable in
+chrome://tracing or Perfetto.
+Bytes read and peak memory are process wide, so with metric_workers threads they include the concurrent metrics.
+'''
+
+import os, os.path
+import sys
+import json
+import time
+import threading
+import resource
+from contextlib import contextmanager
+
+#Per thread CPU usage, only on Linux
+RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD', 1 if sys.platform.startswith('linux') else None)
+
+def bytesRead():
+    '''
+    Gets the bytes read by the process, including the page cache.
+
+    Returns:
+            bytes read, None if not available
+    '''
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except IOError:
+        pass
+    return None
+
+def cpuTime():
+    '''
+    Gets the CPU time, user and system, of the current thread or, where not available, of the process.
+
+    Returns:
+            seconds
+    '''
+    if RUSAGE_THREAD is not None:
+        usage = resource.getrusage(RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+    times = os.times()
+    return times[0] + times[1]
+
+def sample():
+    '''
+    Takes the counters measured for each event.
+
+    Returns:
+            dictionary counter -> value
+    '''
+    return {'wall': time.time(),
+            'cpu': cpuTime(),
+            #Kilobytes on Linux
+            'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            'rchar': bytesRead()}
+
+def event(category, name, before, after, files=None):
+    '''
+    Builds an event from the counters taken before and after it.
+
+    Input:
+        category    "input", "metric" or "workflow"
+        name        section or metric name
+        before      sample() at the start
+        after       sample() at the end
+        files       files opened
+    Returns:
+                    event dictionary
+    '''
+    read = None
+    if before['rchar'] is not None and after['rchar'] is not None:
+        read = after['rchar'] - before['rchar']
+    return {'category': category,
+            'name': name,
+            'pid': os.getpid(),
+            'tid': threading.current_thread().ident,
+            'start': before['wall'],
+            'wall': after['wall'] - before['wall'],
+            'cpu': after['cpu'] - before['cpu'],
+            'maxrss_delta': after['maxrss'] - before['maxrss'],
+            'bytes_read': read,
+            'files': list(files or [])}
+
+@contextmanager
+def measure(events, category, name, files=None):
+    '''
+    Measures the enclosed block, appending its event to a list. Failed blocks are not recorded.
+
+    Input:
+        events      list of events, None to disable the measure
+        category    event category
+        name        section or metric name
+        files       files opened by the block
+    '''
+    if events is None:
+        yield
+        return
+    before = sample()
+    yield
+    events.append(event(category, name, before, sample(), files))
+
+def label(combination):
+    '''
+    Text of a sweep combination.
+
+    Input:
+        combination     dictionary wildcard -> value
+    Returns:
+                        label
+    '''
+    return ' '.join(str(key) + '=' + str(combination[key]) for key in sorted(combination))
+
+def traceEvents(events):
+    '''
+    Converts events to the Chrome trace event format. Each process is named after the sweep combinations it ran.
+
+    Input:
+        events      list of events
+    Returns:
+                    trace dictionary
+    '''
+    trace = []
+    if len(events) == 0:
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+    origin = min(e['start'] for e in events)
+    names = {}
+    for e in events:
+        args = dict((key, e[key]) for key in e if key not in ('name', 'category', 'pid', 'tid', 'start', 'wall'))
+        trace.append({'name': e['name'], 'cat': e['category'], 'ph': 'X',
+                      'ts': (e['start'] - origin) * 1e6, 'dur': e['wall'] * 1e6,
+                      'pid': e['pid'], 'tid': e['tid'], 'args': args})
+        if e.get('combination') and label(e['combination']) not in names.setdefault(e['pid'], []):
+            names[e['pid']].append(label(e['combination']))
+    for pid in sorted(names):
+        trace.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': str(pid) + ': ' + ', '.join(names[pid])}})
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+def writeReport(events, baseName):
+    '''
+    Writes the JSON report and the trace of the events.
+
+    Input:
+        events      list of events
+        baseName    file name without extension
+    '''
+    with open(baseName + '.profile.json', 'w') as f:
+        json.dump({'events': sorted(events, key=lambda e: e['start'])}, f, indent=1)
+    with open(baseName + '.trace.json', 'w') as f:
+        json.dump(traceEvents(events), f)
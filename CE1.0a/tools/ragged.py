@@ -0,0 +1,290 @@
+'''
+Ragged populations.
+A spatial population gives every element its own number of values, the neighbours found around it.
+RaggedArray keeps all of them in a single flat array with the offsets where each element starts,
+instead of an object array holding one small array per element.
+The elements can have leading axes, as time steps or groups, before the element axis.
+'''
+
+import numpy as np
+
+class RaggedArray(object):
+    '''
+    Population with a variable number of values per element.
+    The values of element i, in C order of the leading shape, are values[offsets[i]:offsets[i + 1]].
+    '''
+
+    def __init__(self, values, offsets, shape=None):
+        '''
+        Input:
+            values      flat array with the values of all the elements
+            offsets     start of every element in values, followed by the total number of values
+            shape       leading shape of the elements, one axis by default
+        '''
+        self.values = np.asarray(values).reshape(-1)
+        self.offsets = np.asarray(offsets, dtype='int64').reshape(-1)
+        if shape is None:
+            shape = (len(self.offsets) - 1,)
+        self.leading = tuple(int(s) for s in shape)
+        assert len(self.offsets) == int(np.prod(self.leading)) + 1, "The offsets must have one more entry than elements"
+        assert self.offsets[-1] == len(self.values), "The last offset must be the number of values"
+
+    @property
+    def size(self):
+        '''
+        Number of elements.
+        '''
+        return len(self.offsets) - 1
+
+    @property
+    def width(self):
+        '''
+        Largest number of values of an element.
+        '''
+        if self.size == 0:
+            return 0
+        return int(np.max(np.diff(self.offsets)))
+
+    @property
+    def shape(self):
+        '''
+        Shape of the population padded to the largest element: leading shape and population axis.
+        '''
+        return self.leading + (self.width,)
+
+    @property
+    def ndim(self):
+        return len(self.leading) + 1
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.offsets.nbytes
+
+    def __len__(self):
+        return self.leading[0]
+
+    def __repr__(self):
+        return 'RaggedArray(shape=' + str(self.leading) + ', values=' + str(len(self.values)) + ')'
+
+    def __array__(self, dtype=None):
+        #Code expecting an array gets the population padded with NaN
+        if dtype is None:
+            return self.dense()
+        return self.dense().astype(dtype)
+
+    def __getitem__(self, index):
+        '''
+        Indexes the leading axes. An index reaching the population axis is applied to the padded population.
+        A single element gives its values.
+        '''
+        if not isinstance(index, tuple):
+            index = (index,)
+        if len(index) > len(self.leading) or any(item is Ellipsis or item is None for item in index):
+            return self.dense()[index]
+        ids = np.arange(self.size).reshape(self.leading)[index]
+        if np.ndim(ids) == 0:
+            return self.values[self.offsets[ids]:self.offsets[ids + 1]]
+        return self.take(ids)
+
+    def lengths(self):
+        '''
+        Gets the number of values of every element.
+
+        Returns:
+                    array with the leading shape
+        '''
+        return np.diff(self.offsets).reshape(self.leading)
+
+    def elementIndex(self):
+        '''
+        Gets the element every value belongs to.
+
+        Returns:
+                    array of flat element indices, one per value
+        '''
+        return np.repeat(np.arange(self.size), np.diff(self.offsets))
+
+    def take(self, ids):
+        '''
+        Gets some elements.
+
+        Input:
+            ids     array of flat element indices, its shape is the new leading shape
+        Returns:
+                    RaggedArray. Consecutive elements share the values of this array
+        '''
+        ids = np.asarray(ids, dtype='int64')
+        flat = ids.reshape(-1)
+        starts = self.offsets[flat]
+        lengths = self.offsets[flat + 1] - starts
+        offsets = np.zeros(len(flat) + 1, dtype='int64')
+        offsets[1:] = np.cumsum(lengths)
+        if len(flat) > 0 and np.all(np.diff(flat) == 1):
+            return RaggedArray(self.values[starts[0]:starts[0] + offsets[-1]], offsets, ids.shape)
+        positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, lengths)
+        return RaggedArray(self.values[positions], offsets, ids.shape)
+
+    def dense(self, fill=np.nan):
+        '''
+        Pads every element to the largest one.
+
+        Input:
+            fill    value of the padding
+        Returns:
+                    float array with the leading shape and the population axis
+        '''
+        lengths = np.diff(self.offsets)
+        data = np.empty((self.size, self.width), dtype='float')
+        data.fill(fill)
+        rows = np.repeat(np.arange(self.size), lengths)
+        columns = np.arange(len(self.values)) - np.repeat(self.offsets[:-1], lengths)
+        data[rows, columns] = self.values
+        return data.reshape(self.shape)
+
+def isRagged(data):
+    '''
+    Checks if the data is a ragged population.
+
+    Input:
+        data    data to check
+    Returns:
+                true if it is a RaggedArray
+    '''
+    return isinstance(data, RaggedArray)
+
+def fromLists(lists, shape=None):
+    '''
+    Builds a ragged population from the values of every element.
+
+    Input:
+        lists   sequence of value sequences, or array of objects holding them
+        shape   leading shape, the one of the object array or one axis by default
+    Returns:
+                RaggedArray
+    '''
+    if shape is None:
+        shape = np.shape(lists) if isinstance(lists, np.ndarray) else (len(lists),)
+    if isinstance(lists, np.ndarray):
+        lists = lists.reshape(-1)
+    pieces = [np.asarray(elem, dtype='float').reshape(-1) for elem in lists]
+    offsets = np.zeros(len(pieces) + 1, dtype='int64')
+    offsets[1:] = np.cumsum([len(piece) for piece in pieces])
+    values = np.concatenate(pieces) if len(pieces) > 0 else np.empty(0, dtype='float')
+    return RaggedArray(values, offsets, shape)
+
+def fromDense(data):
+    '''
+    Builds a ragged population from a regular one, the last axis being the population.
+
+    Input:
+        data    array with the leading shape and the population axis
+    Returns:
+                RaggedArray
+    '''
+    data = np.asarray(data)
+    leading = data.shape[:-1]
+    width = data.shape[-1]
+    offsets = np.arange(int(np.prod(leading)) + 1, dtype='int64') * width
+    return RaggedArray(np.ascontiguousarray(data).reshape(-1), offsets, leading)
+
+def asRagged(data):
+    '''
+    Gets the data as a ragged population.
+
+    Input:
+        data    RaggedArray, array of objects or regular array
+    Returns:
+                RaggedArray
+    '''
+    if isRagged(data):
+        return data
+    data = np.asarray(data)
+    if data.dtype == 'object':
+        return fromLists(data)
+    return fromDense(data)
+
+def stack(arrays, shape=None):
+    '''
+    Joins ragged populations with the same leading shape along new first axes.
+
+    Input:
+        arrays  list of RaggedArray
+        shape   shape of the new axes, in C order of the list. One axis by default
+    Returns:
+                RaggedArray
+    '''
+    if shape is None:
+        shape = (len(arrays),)
+    leading = arrays[0].leading
+    for data in arrays:
+        assert data.leading == leading, "Stacked populations must have the same shape"
+    ends = np.cumsum([len(data.values) for data in arrays])
+    offsets = np.concatenate([[0]] + [data.offsets[1:] + start for data, start in zip(arrays, np.concatenate([[0], ends[:-1]]))])
+    return RaggedArray(np.concatenate([data.values for data in arrays]), offsets, tuple(shape) + leading)
+
+def isRaggedGroup(node):
+    '''
+    Checks if an HDF5 node holds a ragged population.
+
+    Input:
+        node    HDF5 group or dataset
+    Returns:
+                true if it is a group with the values and offsets datasets
+    '''
+    return hasattr(node, 'keys') and 'values' in node and 'offsets' in node
+
+def writeHDF5(parent, name, data, **options):
+    '''
+    Writes a ragged population as a group with the values and offsets datasets.
+    The leading shape is kept in the "shape" attribute.
+
+    Input:
+        parent      HDF5 file or group
+        name        group name
+        data        RaggedArray
+        options     h5py create_dataset keyword arguments of the values dataset
+    '''
+    group = parent.create_group(name)
+    group.attrs['shape'] = np.array(data.leading, dtype='int64')
+    group.create_dataset('values', data=data.values, **options)
+    group.create_dataset('offsets', data=data.offsets)
+
+def readHDF5(group):
+    '''
+    Reads a ragged population written by writeHDF5.
+
+    Input:
+        group   HDF5 group
+    Returns:
+                RaggedArray
+    '''
+    return RaggedArray(group['values'][()], group['offsets'][()], tuple(group.attrs['shape']))
+
+def save(fileName, data):
+    '''
+    Saves a ragged population as an uncompressed .npz file.
+
+    Input:
+        fileName    file name or open file
+        data        RaggedArray
+    '''
+    np.savez(fileName, values=data.values, offsets=data.offsets, shape=np.array(data.leading, dtype='int64'))
+
+def load(fileName):
+    '''
+    Loads a ragged population saved by save.
+
+    Input:
+        fileName    file name
+    Returns:
+                    RaggedArray
+    '''
+    stored = np.load(fileName)
+    try:
+        return RaggedArray(stored['values'], stored['offsets'], tuple(stored['shape']))
+    finally:
+        stored.close()
@@ -0,0 +1,253 @@
+'''
+Persistent cache of metric results.
+A result is stored under a key built from the fingerprint of the input files it derives from,
+the section configurations and the compiled metric expression, so rerunning a parameter file
+only recalculates the metrics whose inputs or expressions changed.
+'''
+
+import os, os.path
+import glob
+import hashlib
+import numpy as np
+import ragged
+
+#Changing it invalidates all the stored results. Changes of the code are detected by codeFingerprint
+CACHE_VERSION = '2'
+
+#Sources the results derive from: the metrics, the readers and the workflow evaluating the expressions
+CODE_FILES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics', '*.py'),
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'),
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'workflow.py')]
+
+def inputFiles(parameters, section):
+    '''
+    Lists the files an input section reads. Wildcards [P], [T] and [G] match any value,
+    and directories are listed recursively.
+
+    Input:
+        parameters  configParser parameters
+        section     input section
+    Returns:
+                    sorted list of file names
+    '''
+    pattern = parameters.get(section, 'input_files')
+    for wildcard in ['[P]', '[T]', '[G]']:
+        pattern = pattern.replace(wildcard, '*')
+    files = []
+    for path in glob.glob(pattern):
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        else:
+            files.append(path)
+    return sorted(files)
+
+def fileFingerprint(fileName, hashContent=False):
+    '''
+    Gets the fingerprint of a file.
+
+    Input:
+        fileName        file name
+        hashContent     true to hash the content, otherwise size and modification time are used
+    Returns:
+                        fingerprint string
+    '''
+    if hashContent:
+        digest = hashlib.sha1()
+        with open(fileName, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return os.path.abspath(fileName) + ':' + digest.hexdigest()
+    info = os.stat(fileName)
+    return os.path.abspath(fileName) + ':' + str(info.st_size) + ':' + repr(info.st_mtime)
+
+def sectionFingerprint(parameters, section, hashContent=False):
+    '''
+    Gets the fingerprint of an input section: its configuration and the files it reads.
+
+    Input:
+        parameters      configParser parameters
+        section         input section
+        hashContent     true to hash the file contents
+    Returns:
+                        fingerprint string
+    '''
+    digest = hashlib.sha1()
+    digest.update(repr(sorted(parameters.items(section))))
+    for fileName in inputFiles(parameters, section):
+        digest.update(fileFingerprint(fileName, hashContent))
+    return digest.hexdigest()
+
+def codeFingerprint(patterns=CODE_FILES):
+    '''
+    Gets the fingerprint of the code calculating the results, so results of another version of the code are not reused.
+
+    Input:
+        patterns    file name patterns of the sources
+    Returns:
+                    fingerprint string
+    '''
+    digest = hashlib.sha1()
+    for pattern in patterns:
+        for fileName in sorted(glob.glob(pattern)):
+            digest.update(os.path.basename(fileName))
+            with open(fileName, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+def metricKeys(parameters, order, dependencies, plans, uncacheable, hashContent=False):
+    '''
+    Builds the cache key of every metric. Metrics deriving from an uncacheable one have no key.
+    Keys include the fingerprint of the code, so any change of the code invalidates the stored results.
+
+    Input:
+        parameters      configParser parameters
+        order           metrics in topological order
+        dependencies    dictionary metric -> metrics it depends on
+        plans           dictionary metric -> compiled metric
+        uncacheable     names of the metric functions which must always be calculated
+        hashContent     true to hash the file contents
+    Returns:
+                        dictionary metric -> key, or None when it cannot be cached
+    '''
+    sections = {}
+    keys = {}
+    code = codeFingerprint()
+    for metrics_par in order:
+        plan = plans[metrics_par]
+        if plan.name in uncacheable:
+            keys[metrics_par] = None
+            continue
+        digest = hashlib.sha1()
+        digest.update(CACHE_VERSION)
+        digest.update(code)
+        digest.update(repr(plan.name))
+        for arg in plan.arguments:
+            digest.update(repr((arg.kind, arg.temporal, arg.index)))
+            if arg.kind == 'constant':
+                digest.update(repr(arg.value))
+            elif arg.value in dependencies[metrics_par]:
+                digest.update(str(keys[arg.value]))
+                if keys[arg.value] is None:
+                    digest = None
+                    break
+            else:
+                if arg.value not in sections:
+                    sections[arg.value] = sectionFingerprint(parameters, arg.value, hashContent)
+                digest.update(sections[arg.value])
+        keys[metrics_par] = digest.hexdigest() if digest is not None else None
+    return keys
+
+class ResultCache(object):
+    '''
+    Directory of cached results, one .npy file per key, or .npz for ragged populations,
+    evicting the least recently used over a size limit.
+    '''
+
+    def __init__(self, directory, maxSize=None):
+        '''
+        Input:
+            directory   cache directory
+            maxSize     maximum bytes of the cache, None for no limit
+        '''
+        self.directory = directory
+        self.maxSize = maxSize
+        #Results looked up by this execution, kept by evict until the execution ends
+        self.held = set()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, key, extension='.npy'):
+        return os.path.join(self.directory, key + extension)
+
+    def lookup(self, key):
+        '''
+        Finds a cached result, marking it as recently used.
+
+        Input:
+            key     cache key
+        Returns:
+                    file of the result, None if it is not cached
+        '''
+        if key is None:
+            return None
+        for extension in ['.npy', '.npz']:
+            if os.path.isfile(self.path(key, extension)):
+                self.held.add(key + extension)
+                try:
+                    os.utime(self.path(key, extension), None)
+                except OSError:
+                    #Removed by another execution sharing the cache
+                    self.held.discard(key + extension)
+                    continue
+                return self.path(key, extension)
+        return None
+
+    def store(self, key, data):
+        '''
+        Stores a result.
+
+        Input:
+            key     cache key
+            data    result
+        '''
+        if key is None:
+            return
+        extension = '.npz' if ragged.isRagged(data) else '.npy'
+        #Written aside and renamed, so a concurrent reader never finds a partial file
+        tmp = self.path(key, extension) + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp, 'wb') as f:
+            if ragged.isRagged(data):
+                ragged.save(f, data)
+            else:
+                np.save(f, np.asarray(data), allow_pickle=True)
+        os.rename(tmp, self.path(key, extension))
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes the least recently used results while the cache exceeds its size.
+        The results looked up by this execution are kept.
+        '''
+        if self.maxSize is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') or name.endswith('.npz'):
+                try:
+                    info = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, name))
+        used = sum(entry[1] for entry in entries)
+        for mtime, size, name in sorted(entries):
+            if used <= self.maxSize:
+                break
+            if name in self.held:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            used = used - size
+
+    def clear(self):
+        '''
+        Removes all the cached results.
+        '''
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy') or name.endswith('.npz') or name.endswith('.tmp'):
+                os.remove(os.path.join(self.directory, name))
+
+def load(fileName):
+    '''
+    Reads a cached result.
+
+    Input:
+        fileName    file of the result
+    Returns:
+                    the result
+    '''
+    if fileName.endswith('.npz'):
+        return ragged.load(fileName)
+    return np.load(fileName, allow_pickle=True)
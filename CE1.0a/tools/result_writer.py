@@ -0,0 +1,101 @@
+'''
+HDF5 result writer.
+Writes each metric result as soon as it is calculated, with the storage options set in [Config]:
+    output_dtype                dataset type (default "f")
+    output_chunks               "auto", "none" or a chunk shape such as "1 64 64"
+    output_compression          "gzip", "lzf" or "none"
+    output_compression_level    compression level for gzip
+Every option can be overridden for one metric appending its name, as output_dtype.pdfA = f8.
+Ragged populations are written as a group with the values and offsets datasets, the options applying to the values.
+'''
+
+import h5py
+import numpy as np
+import ragged
+
+def readOption(parameters, option, metric, default):
+    '''
+    Reads an output option, giving precedence to the metric specific one.
+
+    Input:
+        parameters  configParser parameters
+        option      option name
+        metric      metric name
+        default     value when the option is not set
+    Returns:
+                    option value
+    '''
+    if not parameters.has_section('Config'):
+        return default
+    if parameters.has_option('Config', option + '.' + metric):
+        return parameters.get('Config', option + '.' + metric).strip()
+    if parameters.has_option('Config', option):
+        return parameters.get('Config', option).strip()
+    return default
+
+def datasetOptions(parameters, metric, shape):
+    '''
+    Gets the dataset creation options of a metric.
+
+    Input:
+        parameters  configParser parameters
+        metric      metric name
+        shape       shape of the result
+    Returns:
+                    dictionary of h5py create_dataset keyword arguments
+    '''
+    options = {'dtype': np.dtype(readOption(parameters, 'output_dtype', metric, 'f'))}
+    #Scalars and empty results cannot be chunked
+    if len(shape) == 0 or 0 in shape:
+        return options
+    chunks = readOption(parameters, 'output_chunks', metric, 'none').lower()
+    compression = readOption(parameters, 'output_compression', metric, 'none').lower()
+    level = readOption(parameters, 'output_compression_level', metric, None)
+    if chunks == 'auto':
+        options['chunks'] = True
+    elif chunks != 'none':
+        chunks = [int(c) for c in chunks.split()]
+        if len(chunks) != len(shape):
+            print 'ERROR: Chunk shape ', chunks, ' for metric ', metric, ' must have ', len(shape), ' dimensions.'
+            raise Exception()
+        options['chunks'] = tuple(max(1, min(c, s)) for c, s in zip(chunks, shape))
+    if compression != 'none':
+        options['compression'] = compression
+        if level is not None:
+            options['compression_opts'] = int(level)
+    return options
+
+class ResultWriter(object):
+    '''
+    Output file open for the whole execution, so results are saved as they are calculated.
+    '''
+
+    def __init__(self, fileName, parameters):
+        '''
+        Input:
+            fileName    output file name
+            parameters  configParser parameters
+        '''
+        self.parameters = parameters
+        self.hdf = h5py.File(fileName, mode='a')
+
+    def write(self, metric, data):
+        '''
+        Writes a metric result, replacing any previous one with the same name.
+
+        Input:
+            metric  metric name
+            data    result
+        '''
+        #Delete existing keys with the same name
+        if metric in self.hdf:
+            del self.hdf[metric]
+        if ragged.isRagged(data):
+            ragged.writeHDF5(self.hdf, metric, data, **datasetOptions(self.parameters, metric, data.values.shape))
+        else:
+            data = np.asarray(data)
+            self.hdf.create_dataset(metric, data=data, **datasetOptions(self.parameters, metric, data.shape))
+        self.hdf.flush()
+
+    def close(self):
+        self.hdf.close()
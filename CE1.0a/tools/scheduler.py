@@ -0,0 +1,127 @@
+'''
+Dependency graph scheduler.
+Runs the nodes of a directed acyclic graph on a pool of workers, each node waiting only for its own dependencies.
+'''
+
+import Queue
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+def topologicalOrder(nodes, dependencies):
+    '''
+    Sorts the nodes so every node comes after its dependencies.
+    Independent nodes keep the order in which they were given.
+
+    Input:
+        nodes           list of nodes
+        dependencies    dictionary node -> list of nodes it depends on
+    Returns:
+                        list of nodes in execution order
+    '''
+    order = []
+    state = {}
+    for node in nodes:
+        stack = [(node, iter(dependencies.get(node, [])))]
+        if state.get(node) == 'done':
+            continue
+        state[node] = 'visiting'
+        while stack:
+            current, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                state[current] = 'done'
+                order.append(current)
+            elif state.get(child) == 'visiting':
+                print 'ERROR: Cyclic dependency between ', current, ' and ', child, '.'
+                raise Exception()
+            elif state.get(child) != 'done':
+                state[child] = 'visiting'
+                stack.append((child, iter(dependencies.get(child, []))))
+    return order
+
+def createPool(workers, poolType):
+    '''
+    Creates the worker pool.
+
+    Input:
+        workers     number of workers
+        poolType    "thread" or "process"
+    Returns:
+                    the pool
+    '''
+    if poolType == 'thread':
+        return ThreadPool(processes=workers)
+    elif poolType == 'process':
+        return Pool(processes=workers)
+    print 'ERROR: Pool type ', poolType, ' not supported. It must be "thread" or "process".'
+    raise Exception()
+
+def runGraph(nodes, dependencies, prepare, execute, complete, workers=1, poolType='thread'):
+    '''
+    Executes every node of the graph once all its dependencies are completed.
+    With one worker the nodes run sequentially in topological order, without any pool.
+    Otherwise the nodes are prepared, reading their inputs, in a thread pool of the caller process
+    and then executed in the worker pool, so input reading overlaps with the execution of other nodes.
+
+    Input:
+        nodes           list of nodes
+        dependencies    dictionary node -> list of nodes it depends on
+        prepare         function(node) called in the caller process, returns the arguments for execute.
+                        It must be thread safe
+        execute         function(*arguments) computing the node. It must be picklable for process pools
+        complete        function(node, result) called in the caller process when a node finishes
+        workers         number of concurrent workers
+        poolType        "thread" or "process"
+    '''
+    order = topologicalOrder(nodes, dependencies)
+    if workers <= 1:
+        for node in order:
+            complete(node, execute(*prepare(node)))
+        return
+
+    pending = {}
+    dependents = dict((node, []) for node in order)
+    for node in order:
+        deps = set(dependencies.get(node, []))
+        pending[node] = len(deps)
+        for dep in deps:
+            dependents[dep].append(node)
+
+    #The callbacks only wake up the loop, results are collected from the jobs so failures are raised here
+    wakeup = Queue.Queue()
+    loads = {}
+    jobs = {}
+    loader = ThreadPool(processes=workers)
+    pool = createPool(workers, poolType)
+    try:
+        def submit(node):
+            loads[node] = loader.apply_async(prepare, (node,), callback=wakeup.put)
+
+        for node in order:
+            if pending[node] == 0:
+                submit(node)
+        while jobs or loads:
+            #Timeout so failed jobs, which do not call back, and KeyboardInterrupt are not blocked
+            try:
+                wakeup.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+            for node in [n for n in order if n in loads and loads[n].ready()]:
+                jobs[node] = pool.apply_async(execute, loads.pop(node).get(), callback=wakeup.put)
+            for node in [n for n in order if n in jobs and jobs[n].ready()]:
+                result = jobs.pop(node).get()
+                complete(node, result)
+                for dependent in dependents[node]:
+                    pending[dependent] = pending[dependent] - 1
+                    if pending[dependent] == 0:
+                        submit(dependent)
+        loader.close()
+        pool.close()
+    except:
+        loader.terminate()
+        pool.terminate()
+        raise
+    finally:
+        loader.join()
+        pool.join()
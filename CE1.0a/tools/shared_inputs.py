@@ -0,0 +1,88 @@
+'''
+Input data shared by the executions of a parameter sweep.
+Sections whose configuration does not change between sweep combinations are read once by the parent
+process and published as .npy files, in shared memory when available. Workers map them read-only
+instead of reading the original data files again. Ragged populations are published as .npz files,
+which the workers load instead of mapping.
+'''
+
+import os, os.path
+import re
+import shutil
+import tempfile
+import numpy as np
+import ragged
+
+def invariantSections(parameters, replacements):
+    '''
+    Finds the input sections not affected by the sweep replacements.
+
+    Input:
+        parameters      configParser parameters with the sweep wildcards
+        replacements    list of sweep wildcards
+    Returns:
+                        list of section names
+    '''
+    sections = []
+    for section in parameters.sections():
+        if section == 'Metrics' or section == 'Parallel' or section == 'Config':
+            continue
+        text = section + repr(parameters.items(section))
+        if not any(text.count(rep) for rep in replacements):
+            sections.append(section)
+    return sections
+
+def createDirectory():
+    '''
+    Creates the directory for the shared data, in shared memory when available.
+
+    Returns:
+                directory name
+    '''
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return tempfile.mkdtemp(prefix='ce_shared_', dir='/dev/shm')
+    return tempfile.mkdtemp(prefix='ce_shared_')
+
+def publish(name, data, directory):
+    '''
+    Publishes a variable for the workers.
+
+    Input:
+        name        variable name
+        data        variable
+        directory   shared directory
+    Returns:
+                    file name, None if the variable cannot be mapped
+    '''
+    fileName = os.path.join(directory, re.sub(r'[^\w.-]', '_', name))
+    if ragged.isRagged(data):
+        ragged.save(fileName + '.npz', data)
+        return fileName + '.npz'
+    data = np.asarray(data)
+    #Arrays of objects cannot be mapped, each worker reads them
+    if data.dtype == 'object':
+        return None
+    np.save(fileName + '.npy', data)
+    return fileName + '.npy'
+
+def attach(fileName):
+    '''
+    Maps a shared variable without copying it.
+
+    Input:
+        fileName    file name of the published variable
+    Returns:
+                    read-only array, or RaggedArray
+    '''
+    if fileName.endswith('.npz'):
+        return ragged.load(fileName)
+    return np.load(fileName, mmap_mode='r')
+
+def release(directory):
+    '''
+    Removes the shared data.
+
+    Input:
+        directory   shared directory
+    '''
+    shutil.rmtree(directory, ignore_errors=True)
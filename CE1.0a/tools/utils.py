@@ -2,6 +2,10 @@
 Common utility class.
 '''
 
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import ragged
+
 def frange(x, y, jump):
     '''
     Iterator for floating point numbers.
@@ -14,3 +18,69 @@ def frange(x, y, jump):
     while x < y:
         yield x
         x += jump
+
+def slidingWindows(data, window):
+    '''
+    Gets every window of a given length in all the axes of an array, without copying it.
+
+    Input:
+        data    array
+        window  window length in every axis
+    Returns:
+            read-only view. Its shape is the number of windows in every axis followed by the window axes
+    '''
+    data = np.asarray(data)
+    shape = tuple(s - window + 1 for s in data.shape) + (window,) * data.ndim
+    return as_strided(data, shape=shape, strides=data.strides * 2, writeable=False)
+
+def paddedWindows(data, before, window, periodical):
+    '''
+    Gets the neighbourhood of every cell of a field: the window starting before cells ahead of it in every axis.
+    The windows are a strided view of the padded field, so building them does not copy the windows,
+    only the field to pad it. windowPopulation copies them once into the population.
+
+    Input:
+        data        field of any number of dimensions
+        before      cells of the window before the cell, in every axis
+        window      window length in every axis
+        periodical  true if the field wraps around its boundaries
+    Returns:
+                    view with the shape of the field followed by the window axes,
+                    and the mask of the window cells inside the field, None if periodical
+    '''
+    data = np.asarray(data)
+    padding = ((before, window - 1 - before),) * data.ndim
+    if periodical:
+        return slidingWindows(np.pad(data, padding, mode='wrap'), window), None
+    windows = slidingWindows(np.pad(data, padding, mode='constant'), window)
+    #The window cell a of cell i is inside the field if 0 <= i + a - before < size, for every axis
+    mask = np.ones((1,) * (2 * data.ndim), dtype='bool')
+    for axis, size in enumerate(data.shape):
+        position = np.arange(size).reshape(size, 1) + np.arange(window).reshape(1, window) - before
+        inside = (position >= 0) & (position < size)
+        shape = [1] * (2 * data.ndim)
+        shape[axis] = size
+        shape[data.ndim + axis] = window
+        mask = mask & inside.reshape(shape)
+    return windows, mask
+
+def windowPopulation(windows, mask):
+    '''
+    Gets the values of the windows of every cell as a population, cells and windows in C order.
+    The windows overlap, so their values are copied once into the flat values of the population.
+
+    Input:
+        windows     windows given by paddedWindows
+        mask        mask given by paddedWindows, None if every window is whole
+    Returns:
+                    RaggedArray, with the same number of values for every cell if there is no mask
+    '''
+    ndim = windows.ndim // 2
+    cells = int(np.prod(windows.shape[:ndim]))
+    if mask is None:
+        #A single copy to the (cells, window) population matrix
+        return ragged.fromDense(windows.reshape((cells, -1)))
+    mask = np.broadcast_to(mask, windows.shape)
+    offsets = np.zeros(cells + 1, dtype='int64')
+    offsets[1:] = np.cumsum(mask.reshape((cells, -1)).sum(axis=1))
+    return ragged.RaggedArray(windows[mask], offsets)
@@ -0,0 +1,143 @@
+'''
+Workflow variable store.
+Input sections are read the first time a metric needs them. Inputs and metric results are dropped when their last consumer finishes.
+A memory budget bounds the inputs kept in memory, evicting the least recently used ones.
+'''
+
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def dataSize(data):
+    '''
+    Estimates the memory used by a variable.
+
+    Input:
+        data    variable
+    Returns:
+            size in bytes
+    '''
+    if isinstance(data, np.ndarray):
+        if data.dtype == 'object':
+            return data.nbytes + sum(dataSize(elem) for elem in data.flat)
+        return data.nbytes
+    if isinstance(data, (list, tuple)):
+        return sum(dataSize(elem) for elem in data)
+    return getattr(data, 'nbytes', 0)
+
+class VariableStore(object):
+    '''
+    Variable dictionary of a workflow execution.
+    Input variables are loaded on demand. Metric results are kept while a pending metric references them.
+    '''
+
+    def __init__(self, loader, consumers, budget=None):
+        '''
+        Input:
+            loader      function(name) reading an input variable
+            consumers   dictionary variable name -> number of metrics referencing it
+            budget      maximum bytes of input variables kept in memory, None for no limit
+        '''
+        self.loader = loader
+        self.consumers = dict(consumers)
+        self.budget = budget
+        self.inputs = OrderedDict()
+        self.sizes = {}
+        self.pins = {}
+        self.results = {}
+        self.loads = {}
+        self.lock = threading.RLock()
+        self.loading = {}
+
+    def put(self, name, value):
+        '''
+        Stores a metric result, unless no metric references it.
+
+        Input:
+            name    metric name
+            value   result
+        '''
+        with self.lock:
+            if self.consumers.get(name, 0) > 0:
+                self.results[name] = value
+            #A metric with the name of an input section hides it from now on
+            if name in self.inputs:
+                self.drop(name)
+
+    def get(self, name, pin=False):
+        '''
+        Gets a variable, reading it if it is an input not in memory.
+
+        Input:
+            name    variable name
+            pin     true to protect the variable from eviction until it is released
+        Returns:
+                    the variable
+        '''
+        with self.lock:
+            if name in self.results:
+                return self.results[name]
+            if name not in self.loading:
+                self.loading[name] = threading.Lock()
+            loading = self.loading[name]
+        #Only one reader per variable, without blocking the other variables
+        with loading:
+            with self.lock:
+                present = name in self.inputs
+                if present:
+                    data = self.inputs.pop(name)
+                    self.inputs[name] = data
+            if not present:
+                data = self.loader(name)
+                with self.lock:
+                    self.inputs[name] = data
+                    self.sizes[name] = dataSize(data)
+                    self.loads[name] = self.loads.get(name, 0) + 1
+            with self.lock:
+                if pin:
+                    self.pins[name] = self.pins.get(name, 0) + 1
+                self.evict()
+        return data
+
+    def release(self, name, unpin=True):
+        '''
+        Marks that a consumer of the variable has finished. Variables without remaining consumers are dropped.
+
+        Input:
+            name    variable name
+            unpin   true if the consumer got the variable pinned
+        '''
+        with self.lock:
+            if unpin and self.pins.get(name, 0) > 0:
+                self.pins[name] = self.pins[name] - 1
+            if name in self.consumers:
+                self.consumers[name] = self.consumers[name] - 1
+                if self.consumers[name] <= 0 and name in self.inputs:
+                    self.drop(name)
+                if self.consumers[name] <= 0 and name in self.results:
+                    del self.results[name]
+            self.evict()
+
+    def drop(self, name):
+        '''
+        Removes an input variable from memory.
+
+        Input:
+            name    variable name
+        '''
+        del self.inputs[name]
+        del self.sizes[name]
+
+    def evict(self):
+        '''
+        Drops the least recently used inputs not in use while the memory budget is exceeded.
+        '''
+        if self.budget is None:
+            return
+        used = sum(self.sizes.values())
+        for name in list(self.inputs.keys()):
+            if used <= self.budget:
+                break
+            if self.pins.get(name, 0) == 0:
+                used = used - self.sizes[name]
+                self.drop(name)
@@ -19,6 +19,14 @@ import graph_tools as gt
 import mesh_tools as mt
 import meshless_tools as pt
 import ce_data_tools as ce
+import scheduler as sch
+import metric_parser as mpar
+import variable_store as vs
+import result_writer as rw
+import result_cache as rc
+import shared_inputs as si
+import profiler as prof
+import ragged
 #metrics
 import PDF as PDF
 import MI as MI
@@ -36,98 +44,21 @@ import Early_warning as ew
 
 import time
 
-def getTyped(s):
-    '''
-    Gets the type of the variable
-
-    Input:
-        s       variable
-    Returns:
-                type
-    '''
-    if s.count('.') > 0:
-            return float(s)
-    else:
-            return int(s)
-
-def isNum(s):
-    '''
-    Checks if the variable is a number
-
-    Input:
-        s       variable
-    Returns:
-                true if number
-    '''
-    try:
-        int(s)
-        return True
-    except ValueError:
-        try:
-            float(s)
-            return True
-        except ValueError:
-            return False
-
-def isString(s):
-    '''
-    Checks if the variable is a string
-
-    Input:
-        s       variable
-    Returns:
-                true if string
-    '''
-    if re.match(r'"[^"]+"', s) != None:
-        return True
-    return False
-
-def isList (s):
-    '''
-    Checks if the variable is a list
-
-    Input:
-        s       variable
-    Returns:
-                true if list
-    '''
-    lista = re.split(r' (?=(?:[^\[]*\[[^\[]*\])*[^\]]*$)', s)
-    return len(lista) > 1
-
-def createList(s):
-    '''
-    Creates a list from the values of a variable
-
-    Input:
-        s       variable
-    Returns:
-                list
-    '''
-    listRange = []
-    for elem in s.split():
-        listRange.append(getTyped(elem))
-    return listRange
-
 def checkArray(data):
     '''
     Checks if the data is an array type and fixes when the dimensions are not the same length.
+    Ragged populations are kept as they are, they are written in their compact form.
 
     Input:
         data    data to check
     Returns:
                 data fixed if is an array with different dimensions in its content.
     '''
+    if ragged.isRagged(data):
+        return data
+    data = np.asarray(data)
     if data.dtype == 'object':
-        maxIndex = 0
-        for index, val in np.ndenumerate(data):
-            if len(data[index]) > maxIndex:
-                maxIndex = len(data[index])
-        temporal = np.ndarray(shape=(data.shape + (maxIndex,)))
-        for index, val in np.ndenumerate(data):
-            tmp = np.resize(np.array(data[index]), maxIndex)
-            tmp[len(data[index]):] = np.nan
-            temporal[index] = tmp
-        return temporal
+        return ragged.fromLists(data).dense()
     else:
         return data
 
@@ -155,89 +86,27 @@ def readData(parameters, variable):
         print 'ERROR: Input data origin not recognized/supported. Variable: ', variable, '.'
         raise Exception()
 
-def readmetricParameters(metric_parameters, metric_name, time, global_variable_dic):
-    '''
-    Reads parameters used in a metric.
+#Metrics accepting extra leading axes in their parameters, so a temporal loop can be computed in a single call
+batchMetrics = ['pdf', 'shannon', 'kullback-leibler', 'hellinger-distance', 'surprise', 'mutual_information']
 
-    Input:
-        metric_parameters   string with the parameters
-        metric_name         the metric
-        time                when the metric uses temporal parameters, this is the time index
-        global_variable_dic variable dictionary
-    Returns:
-                            parameter values
-    '''
-    param_vals = []
-    if metric_parameters != '':
-        try:
-            for par in re.split(r',(?=(?:[^\[\]]*\[[^\[\]]*\])*[^\[\]]*$)', metric_parameters):
-                par = par.strip()
-                #numerical constant
-                if isNum(par):
-                    param_vals.append(getTyped(par))
-                #boolean constant
-                elif par.lower() == 'true' or par.lower() == 'false':
-                    if par.lower() == 'true':
-                        param_vals.append(True)
-                    else:
-                        param_vals.append(False)
-                #String
-                elif isString(par):
-                    param_vals.append(par[1:len(par)-1])
-                #numerical list
-                elif isList(par):
-                    param_vals.append(createList(par))
-                #variable slice
-                elif par.count('['):
-                    #variable slice temporal
-                    if par.count('{'):
-                        par = par[1:len(par) - 1]
-                        slices = re.findall(r'\[.*\]', par)
-                        if len(global_variable_dic[par[:par.index('[')]].shape) != 3:
-                            print 'ERROR: {Variables} must come from statistical_temporal variables or derivatives. Location: ', metric_name, '. Variable: ', par, '.'
-                            raise Exception()
-                        tmp = eval("global_variable_dic[par[:par.index('[')]][" + str(time) + "]" + slices[0])
-                        param_vals.append(tmp)
-                    else:
-                        slices = re.findall(r'\[.*\]', par)
-                        tmp = eval("global_variable_dic[par[:par.index('[')]]" + slices[0])
-                        param_vals.append(tmp)
-                #variable
-                else:
-                    try:
-                        if par.count('{'):
-                            par = par[1:len(par) - 1]
-                            if len(global_variable_dic[par].shape) != 3:
-                                print 'ERROR: {Variables} must come from statistical_temporal variables or derivatives. Location: ', metric_name, '. Variable: ', par, '.'
-                                raise Exception()
-                            param_vals.append(global_variable_dic[par][time, ...])
-                        else:
-                            param_vals.append(global_variable_dic[par])
-                    except KeyError:
-                        print 'ERROR: Error in ', metric_name, '. Variable ', par, ' does not exist.'
-                        raise Exception()        
-        except:
-            print 'ERROR: Error in ', metric_name, ', parameter ' + par + ' is not correct.'
-            raise Exception()
-    return param_vals
+#Metrics sampling their data at random, never taken from the result cache
+randomMetrics = ['idt_individual', 'information_integration', 'multi_information']
 
-def getTime(metric_parameters, global_variable_dic):
+def isBatch(plan):
     '''
-    Reads temporal parameters from a metric.
+    Checks if a temporal metric can get the whole time series in one call.
 
     Input:
-        metric_parameters   string with the parameters
-        global_variable_dic variable dictionary
+        plan    compiled metric
     Returns:
-                            time slices
+                true if the metric supports batches and no temporal parameter is sliced
     '''
-    for par in re.split(r',(?=(?:[^\[]*\[[^\[]*\])*[^\]]*$)', metric_parameters):
-        par = par.strip()
-        if par.count('{'):
-            par = par[1:par.index('}')]
-            if par.count('['):
-                par = par[:par.index('[')]
-            return global_variable_dic[par].shape[0]        
+    if plan.name not in batchMetrics:
+        return False
+    for arg in plan.arguments:
+        if arg.temporal and len(arg.index) > 0:
+            return False
+    return True
 
 def calculateMetric(metric_name, param_vals):
     '''
@@ -274,6 +143,11 @@ def calculateMetric(metric_name, param_vals):
             print 'ERROR:Error in ', metric_name, ', number of parameters incorrect. It must be pdf_joint(dataA, bin_valuesA, continuous_binsA, dataB, bin_valuesB, continuous_binsB)'
             raise Exception()
         return PDF.joint(*param_vals)
+    elif metric_name == 'pdf_conditional':
+        if len(param_vals)!= 6:
+            print 'ERROR:Error in ', metric_name, ', number of parameters incorrect. It must be pdf_conditional(dataA, bin_valuesA, continuous_binsA, dataB, bin_valuesB, continuous_binsB)'
+            raise Exception()
+        return PDF.conditional(*param_vals)
     elif metric_name == 'mutual_information':
         if len(param_vals) < 3 or len(param_vals) > 4:
             print 'ERROR:Error in ', metric_name, ', number of parameters incorrect. It must be mutual_information(pdfA, pdfB, joint_pdf, logbase="log2")'
@@ -353,153 +227,342 @@ def calculateMetric(metric_name, param_vals):
             print 'ERROR:Metric ', metric_name, ' does not exist'
             raise Exception()
 
-def processSimpleWorkflow(parameters):
+def buildMetricGraph(parameters):
+    '''
+    Compiles every metric expression and builds the dependency graph of the Metrics section.
+
+    Input:
+        parameters  configParser parameters
+    Returns:
+                    list of metrics, dictionary metric -> metrics it depends on, dictionary metric -> compiled metric
+    '''
+    metrics = parameters.options('Metrics')
+    inputs = [data for data in parameters.sections() if data != 'Metrics' and data != 'Parallel' and data != 'Config']
+    dependencies = {}
+    plans = {}
+    for metrics_par in metrics:
+        str_aux = parameters.get('Metrics' , metrics_par)
+        plans[metrics_par] = mpar.compileMetric(str_aux)
+        dependencies[metrics_par] = []
+        for name in mpar.references(plans[metrics_par]):
+            #A metric referencing its own name refers to the input section
+            if name in metrics and name != metrics_par:
+                dependencies[metrics_par].append(name)
+            elif name not in inputs:
+                if plans[metrics_par].name is not None:
+                    print 'ERROR: Error in ', str_aux, '. Variable ', name, ' does not exist.'
+                else:
+                    print 'ERROR: Metric ', str_aux, ' does not exist'
+                raise Exception()
+    return metrics, dependencies, plans
+
+def evaluateMetric(metrics_par, plan, variables, cached=None, profiled=False):
+    '''
+    Calculates a compiled metric.
+
+    Input:
+        metrics_par     metric name in the Metrics section
+        plan            compiled metric expression
+        variables       dictionary with the variables referenced by the expression
+        cached          cached result, if any
+        profiled        true to measure the calculation
+    Returns:
+                        result of the metric, with its profiler event when profiled
+    '''
+    try:
+        events = [] if profiled else None
+        start = time.time()
+        with prof.measure(events, 'metric', metrics_par):
+            if cached is not None:
+                tmp = cached
+            else:
+                time2 = mpar.checkTemporal(plan, variables)
+                #It is a field
+                if plan.name is None:
+                    tmp = checkArray(mpar.evaluateArguments(plan, variables)[0])
+                elif time2 is not None and isBatch(plan):
+                    #The whole time axis in a single vectorized call
+                    tmp = calculateMetric(plan.name, mpar.evaluateArguments(plan, variables, None))
+                elif time2 is not None:
+                    for t in xrange(time2):
+                        result = np.asarray(calculateMetric(plan.name, mpar.evaluateArguments(plan, variables, t)))
+                        #Output allocated once the shape of a time step is known
+                        if t == 0:
+                            tmp = np.empty((time2,) + result.shape, dtype=result.dtype)
+                        tmp[t] = result
+                else:
+                    tmp = calculateMetric(plan.name, mpar.evaluateArguments(plan, variables))
+        if cached is not None:
+            print "Metric", metrics_par, "cached"
+        else:
+            print "Metric", metrics_par, (time.time() - start)
+        if profiled:
+            return (tmp, events[0])
+        return tmp
+    except Exception,e:
+        print 'ERROR: Metric ', plan.expression, ' failed:' + str(e)
+        raise Exception()
+
+def openCache(parameters):
+    '''
+    Opens the result cache configured in [Config]:
+        cache       false to disable it
+        cache_dir   cache directory, by default .ce_cache next to the output file
+        cache_size  maximum size in MB, 1024 by default
+
+    Input:
+        parameters  configParser parameters
+    Returns:
+                    ResultCache, None if disabled
+    '''
+    outputFile = "output.h5"
+    directory = None
+    size = 1024.0
+    if parameters.has_section('Config'):
+        if parameters.has_option('Config', 'cache') and not parameters.getboolean('Config', 'cache'):
+            return None
+        outputFile = parameters.get('Config' , "output_fileName")
+        if parameters.has_option('Config', 'cache_dir'):
+            directory = parameters.get('Config', 'cache_dir')
+        if parameters.has_option('Config', 'cache_size'):
+            size = parameters.getfloat('Config', 'cache_size')
+    if directory is None:
+        directory = os.path.join(os.path.dirname(os.path.abspath(outputFile)), '.ce_cache')
+    return rc.ResultCache(directory, size * 1024 * 1024)
+
+def processSimpleWorkflow(parameters, shared=None, combination=None):
     '''
     Performs an uniprocessor execution.
+    Independent metrics run concurrently when [Config] sets metric_workers greater than 1,
+    using a thread pool or, with metric_pool = process, a process pool.
+    Input sections are read when a metric first needs them. [Config] memory_budget (MB) bounds
+    the input data kept in memory.
+    Metrics whose inputs and expression did not change since a previous execution are read from
+    the result cache instead of calculated.
+    [Config] profile = true writes the profiler report next to the output file.
 
     Input:
         parameters     parameter file for this execution
+        shared         dictionary input section -> file published by the parent of a parameter sweep
+        combination    dictionary wildcard -> value of a parameter sweep execution
+    Returns:
+                       list of profiler events, empty when not profiled
     '''
     try:
-        global_variable_dic = {}
-
-        #Read data
-        for data in parameters.sections():
-            if data != 'Metrics' and data != 'Parallel' and data != 'Config':
-                start = time.clock()
-                global_variable_dic[data] = readData(parameters, data)
-                end = time.clock()
+        begin = prof.sample()
+        #Parse the metrics before reading anything, so expression errors show up first
+        metrics, dependencies, plans = buildMetricGraph(parameters)
+
         #Output file
+        outputFile = "output.h5"
+        workers = 1
+        poolType = 'thread'
+        budget = None
+        profiled = False
         if (parameters.has_section('Config')):
             outputFile = parameters.get('Config' , "output_fileName")
-        else:
-            outputFile = "output.h5"
-        
-        results = {}
+            if parameters.has_option('Config', 'metric_workers'):
+                workers = parameters.getint('Config', 'metric_workers')
+            if parameters.has_option('Config', 'metric_pool'):
+                poolType = parameters.get('Config', 'metric_pool')
+            if parameters.has_option('Config', 'memory_budget'):
+                budget = parameters.getfloat('Config', 'memory_budget') * 1024 * 1024
+            if parameters.has_option('Config', 'profile'):
+                profiled = parameters.getboolean('Config', 'profile')
+        events = [] if profiled else None
+
+        #Input data, read on demand, and metric results, kept while referenced
+        consumers = {}
+        for metrics_par in metrics:
+            for name in mpar.references(plans[metrics_par]):
+                consumers[name] = consumers.get(name, 0) + 1
+        def load(data):
+            if shared is not None and data in shared:
+                with prof.measure(events, 'input', data, [shared[data]]):
+                    return si.attach(shared[data])
+            with prof.measure(events, 'input', data, rc.inputFiles(parameters, data) if profiled else None):
+                return readData(parameters, data)
+        global_variable_dic = vs.VariableStore(load, consumers, budget)
+
+        #Results are written as soon as each metric finishes
+        try:
+            writer = rw.ResultWriter(outputFile, parameters)
+        except Exception,e:
+            print 'ERROR: Problem opening output file failed:' + str(e)
+            raise Exception()
+
+        #Cached results, looked up when the metric is prepared. Their inputs are not read
+        cache = openCache(parameters)
+        keys = dict((metrics_par, None) for metrics_par in metrics)
+        if cache is not None:
+            hashContent = parameters.has_option('Config', 'cache_hash') and parameters.get('Config', 'cache_hash') == 'content'
+            keys = rc.metricKeys(parameters, sch.topologicalOrder(metrics, dependencies), dependencies, plans, randomMetrics, hashContent)
+        cached = dict((metrics_par, False) for metrics_par in metrics)
+
         #Metrics
-        for metrics_par in parameters.options('Metrics'):
+        def prepare(metrics_par):
+            fileName = cache.lookup(keys[metrics_par]) if cache is not None else None
+            if fileName is not None:
+                try:
+                    with prof.measure(events, 'input', metrics_par, [fileName]):
+                        result = rc.load(fileName)
+                    cached[metrics_par] = True
+                    return (metrics_par, plans[metrics_par], {}, result, profiled)
+                except (IOError, OSError):
+                    #Removed after the lookup by another execution sharing the cache, so it is calculated
+                    pass
+            variables = dict((name, global_variable_dic.get(name, pin=True)) for name in mpar.references(plans[metrics_par]))
+            return (metrics_par, plans[metrics_par], variables, None, profiled)
+
+        def complete(metrics_par, result):
+            if profiled:
+                result, metricEvent = result
+                events.append(metricEvent)
             try:
-                str_aux = parameters.get('Metrics' , metrics_par)
-                metric_loop = str_aux.count('{') > 0
-                start = time.clock()
-                #It is a metric
-                if str_aux.count('('):
-                    metric_name = str_aux[:str_aux.index('(')]
-                    metric_parameters = str_aux[str_aux.index('(') + 1:str_aux.index(')')]
-                    if metric_loop:
-                        #Get parameters for the metric
-                        time2 = getTime(metric_parameters, global_variable_dic)
-                        first = True
-                        for t in xrange(time2):
-                            param_vals = readmetricParameters(metric_parameters, str_aux, t, global_variable_dic)
-                            if first:
-                                tmp = calculateMetric(metric_name, param_vals)
-                                axislen = len(tmp.shape)
-                                tmp = np.expand_dims(tmp, axis=0)
-                                first = False
-                            else:
-                                result = calculateMetric(metric_name, param_vals)
-                                result = np.expand_dims(result, axis=0)
-                                tmp = np.append(tmp, result, axis=0)
-                        
-                        global_variable_dic[metrics_par] = tmp
-                    else:
-                        #Get parameters for the metric
-                        param_vals = readmetricParameters(metric_parameters, str_aux, 0, global_variable_dic)
-                        #Call the metric and save results
-                        global_variable_dic[metrics_par] = calculateMetric(metric_name, param_vals)
-                #It is a field
-                else:
-                    if str_aux.count('['):
-                        metric_name = str_aux[:str_aux.index('[')]
-                    else:
-                        metric_name = str_aux
-                    if parameters.has_section(metric_name):
-                        if str_aux.count('['):
-                            slices = re.findall(r'\[.*\]', str_aux)
-                            global_variable_dic[metrics_par] = checkArray(np.array(eval("global_variable_dic[metric_name]" + slices[0])))
-                        else:
-                            global_variable_dic[metrics_par] = checkArray(np.array(global_variable_dic[metric_name]))
-                    else:
-                        print 'ERROR: Metric ', str_aux, ' does not exist'
-                        raise Exception()
-                end = time.clock()
-                print "Metric", metrics_par, (end - start)
-        
-                results[metrics_par] = global_variable_dic[metrics_par][:]
+                writer.write(metrics_par, result)
             except Exception,e:
-                print 'ERROR: Metric ', str_aux, ' failed:' + str(e)
+                print 'ERROR: Problem writing results failed:' + str(e)
                 raise Exception()
+            if cache is not None and not cached[metrics_par]:
+                cache.store(keys[metrics_par], result)
+            global_variable_dic.put(metrics_par, result)
+            for name in mpar.references(plans[metrics_par]):
+                global_variable_dic.release(name, not cached[metrics_par])
 
-        #Write output file
         try:
-            hdf = h5py.File(outputFile, mode='a')
-            for metrics_par in parameters.options('Metrics'):
-                #Delete existing keys with the same name 
-                if metrics_par in hdf.keys():
-                    del hdf[metrics_par]
-                dset = hdf.require_dataset(metrics_par, results[metrics_par].shape, dtype='f')
-                dset[:] = results[metrics_par][:]
-            hdf.close()
-        except Exception,e:
-            print 'ERROR: Problem writing results failed:' + str(e)
-            raise Exception()
+            sch.runGraph(metrics, dependencies, prepare, evaluateMetric, complete, workers, poolType)
+        finally:
+            writer.close()
+
+        if not profiled:
+            return []
+        events.append(prof.event('workflow', os.path.basename(outputFile), begin, prof.sample()))
+        for e in events:
+            e['combination'] = combination
+        prof.writeReport(events, os.path.splitext(outputFile)[0])
+        return events
     except KeyboardInterrupt:
-        return
+        return []
 
 
+def sweepValues(paramFile):
+    '''
+    Reads the wildcards of the Parallel section and their values.
+
+    Input:
+        paramFile   parameter file content
+    Returns:
+                    list of wildcards, list with the values of each wildcard
+    '''
+    lists = []
+    replacements = []
+    #Read parallel section
+    for metrics_par in paramFile.options('Parallel'):
+        if metrics_par.count('#'):
+            value = paramFile.get('Parallel' , metrics_par)
+            #Parse range
+            if value.count('..'):
+                values = value.split('..')
+                init = eval(values[0])
+                end = eval(values[1])
+                if len(values) > 2:
+                    step = eval(values[2])
+                else:
+                    step = 1
+                #Include last step
+                lists.append(np.arange(init, end + step, step))
+            #Parse list
+            else:
+                values = value.split(' ')
+                lists.append(values)
+            replacements.append('#' + metrics_par)
+    return replacements, lists
+
+def shareInputs(parameters, paramFile, directory):
+    '''
+    Reads once the input sections that are the same in every sweep combination and publishes them for the workers.
+
+    Input:
+        parameters  configParser parameters
+        paramFile   original parameter file name
+        directory   shared directory
+    Returns:
+                    dictionary input section -> published file
+    '''
+    replacements, lists = sweepValues(parameters)
+    #The references of the first combination tell which sections the metrics use
+    first = readParameterText(next(parallelizeParameters(parameters, paramFile)))
+    metrics, dependencies, plans = buildMetricGraph(first)
+    referenced = set()
+    for metrics_par in metrics:
+        referenced.update(name for name in mpar.references(plans[metrics_par]) if name not in dependencies[metrics_par])
+    shared = {}
+    for section in si.invariantSections(parameters, replacements):
+        if section in referenced:
+            fileName = si.publish(section, readData(parameters, section), directory)
+            if fileName is not None:
+                shared[section] = fileName
+    return shared
+
 def parallelizeParameters(paramFile, original):
     '''
-    When a parallel execution is required, this method creates all the parameter input file for the single executions.
+    When a parallel execution is required, this method generates the parameter input file for each single execution.
+    Combinations are produced one at a time, as the workers ask for them.
 
     Input:
         paramFile   parameter file content
         original    original parameter file name
     Returns:
-                    Array of parameters input
+                    generator of parameter file texts
     '''
-    parameters = []
-    if (paramFile.has_section('Parallel')):
-        #Open the original parameter file
-        with open (original, "r") as originalFile:
-                pFile=originalFile.read()
-        lists = []
-        replacements = []
-        #Read parallel section
-        for metrics_par in paramFile.options('Parallel'):
-            if metrics_par.count('#'):
-                value = paramFile.get('Parallel' , metrics_par)
-                #Parse range
-                if value.count('..'):
-                    values = value.split('..')
-                    init = eval(values[0])
-                    end = eval(values[1])
-                    if len(values) > 2:
-                        step = eval(values[2])
-                    else:
-                        step = 1
-                    #Include last step
-                    lists.append(np.arange(init, end + step, step))
-                #Parse list
-                else:
-                    values = value.split(' ')
-                    lists.append(values)
-                replacements.append('#' + metrics_par)
-        #Generate all combinations
-        combinations = list(itertools.product(*lists))
-        for comb in combinations:
-            newParams = pFile
-            for rep in xrange(len(replacements)):
-                newParams = newParams.replace(replacements[rep], str(comb[rep]))
-            newParParser = ConfigParser.RawConfigParser()
-            newParParser.optionxform=str
-            newParParser.readfp(StringIO.StringIO(newParams))
-            parameters.append(newParParser)
+    #Open the original parameter file
+    with open (original, "r") as originalFile:
+            pFile=originalFile.read()
+    if not paramFile.has_section('Parallel'):
+        yield pFile
+        return
+    replacements, lists = sweepValues(paramFile)
+    #Generate the combinations lazily
+    for comb in itertools.product(*lists):
+        newParams = pFile
+        for rep in xrange(len(replacements)):
+            newParams = newParams.replace(replacements[rep], str(comb[rep]))
+        yield newParams
+
+def readParameterText(paramText, useCache=True):
+    '''
+    Creates the parameters of an execution from the text of a parameter file.
 
-    else:
-        parameters.append(paramFile)
+    Input:
+        paramText   parameter file text
+        useCache    false to bypass the result cache
+    Returns:
+                    configParser parameters
+    '''
+    parameters = ConfigParser.RawConfigParser()
+    parameters.optionxform=str
+    parameters.readfp(StringIO.StringIO(paramText))
+    if not useCache:
+        if not parameters.has_section('Config'):
+            parameters.add_section('Config')
+            parameters.set('Config', 'output_fileName', 'output.h5')
+        parameters.set('Config', 'cache', 'false')
     return parameters
 
+def processParameterFile((paramText, useCache, shared, combination)):
+    '''
+    Performs the execution of one combination of a parallel parameter sweep.
+
+    Input:
+        paramText   parameter file text
+        useCache    false to bypass the result cache
+        shared      dictionary input section -> file published by the parent
+        combination dictionary wildcard -> value of this combination
+    Returns:
+                    list of profiler events
+    '''
+    return processSimpleWorkflow(readParameterText(paramText, useCache), shared, combination)
+
 def main(argv):
     '''
     Main function. Reads the parameters and create the pool for the parallel processes.
@@ -507,19 +570,25 @@ def main(argv):
     Input:
         argv    standard arguments
     '''
-    start_g = time.clock()
+    start_g = time.time()
     #Script usage
     try:
-        opts, args = getopt.getopt(argv,"hp:",["help", "parameter-file="])
+        opts, args = getopt.getopt(argv,"hp:",["help", "parameter-file=", "no-cache", "clear-cache"])
     except getopt.GetoptError:
-        print 'USAGE: python workflow_graph.py -p <parameter-file>'
+        print 'USAGE: python workflow_graph.py -p <parameter-file> [--no-cache] [--clear-cache]'
         raise Exception()
+    useCache = True
+    clearCache = False
     for opt, arg in opts:
         if opt == '-h':
-                print 'USAGE: python workflow_graph.py -p <parameter-file>'
+                print 'USAGE: python workflow_graph.py -p <parameter-file> [--no-cache] [--clear-cache]'
                 sys.exit()
         elif opt in ("-p", "--parameter-file"):
                 paramFile = arg
+        elif opt == "--no-cache":
+                useCache = False
+        elif opt == "--clear-cache":
+                clearCache = True
 
     #Read parameter file
     parameters = ConfigParser.RawConfigParser()
@@ -533,25 +602,54 @@ def main(argv):
         print 'ERROR: The parameter file is not correct'
         raise Exception()
 
-    procs = 1
-    if (parameters.has_section('Parallel') and parameters.has_option('Parallel', 'nprocs')):
-        procs = parameters.getint('Parallel' , 'nprocs')
+    #Result cache
+    if not parameters.has_section('Config'):
+        parameters.add_section('Config')
+        parameters.set('Config', 'output_fileName', 'output.h5')
+    if clearCache:
+        cache = openCache(parameters)
+        if cache is not None:
+            cache.clear()
+    if not useCache:
+        parameters.set('Config', 'cache', 'false')
 
     #Parallel processing
-    processSimpleWorkflow(parameters)
-    '''    pool = Pool(processes=procs)
+    if parameters.has_section('Parallel'):
+        procs = 1
+        if parameters.has_option('Parallel', 'nprocs'):
+            procs = parameters.getint('Parallel' , 'nprocs')
+        chunksize = 1
+        if parameters.has_option('Parallel', 'chunksize'):
+            chunksize = parameters.getint('Parallel' , 'chunksize')
+        #Inputs common to all the combinations are read only here
+        sharedDir = si.createDirectory()
         try:
-            pool.map_async(processSimpleWorkflow, parallelizeParameters(parameters, paramFile))
-            pool.close()
-            pool.join()
-        except KeyboardInterrupt:
-            print "Caught KeyboardInterrupt, terminating workers"
-            pool.terminate()
-            pool.join()
-
-        end_g = time.clock()
-        print "Total", (end_g - start_g)
-    '''
+            shared = shareInputs(parameters, paramFile, sharedDir)
+            replacements, lists = sweepValues(parameters)
+            combinations = (dict(zip(replacements, [str(value) for value in comb])) for comb in itertools.product(*lists))
+            events = []
+            pool = Pool(processes=procs)
+            try:
+                sweep = itertools.izip(parallelizeParameters(parameters, paramFile), itertools.repeat(useCache), itertools.repeat(shared), combinations)
+                for result in pool.imap_unordered(processParameterFile, sweep, chunksize):
+                    events.extend(result)
+                pool.close()
+                pool.join()
+                #All the workers in a single timeline, next to the parameter file
+                if len(events) > 0:
+                    prof.writeReport(events, os.path.splitext(paramFile)[0])
+            except KeyboardInterrupt:
+                print "Caught KeyboardInterrupt, terminating workers"
+                pool.terminate()
+                pool.join()
+        finally:
+            si.release(sharedDir)
+    else:
+        processSimpleWorkflow(parameters)
+
+    end_g = time.time()
+    print "Total", (end_g - start_g)
+
 if __name__ == "__main__":
     # making  global dic managed by multiprocessing
     manager = Manager()